@@ -1,34 +1,50 @@
 from datetime import datetime
-from typing import List
+from threading import Lock
+from typing import List, Dict
 
 from cloudshell.api.cloudshell_api import ReservationDescriptionInfo
 from cloudshell.api.common_cloudshell_api import CloudShellAPIError
 from cloudshell.workflow.orchestration.sandbox import Sandbox
+from cloudshell.orch.training.models.config import TrainingWorkflowConfig
 from cloudshell.orch.training.models.position import Position
 from cloudshell.orch.training.models.training_env import TrainingEnvironmentDataModel
+from cloudshell.orch.training.services.reservation_snapshot import ReservationSnapshotService
+from cloudshell.orch.training.services.resource_positions import ResourcePositionsUpdater
 from cloudshell.orch.training.services.sandbox_components import SandboxComponentsHelperService
 from cloudshell.email import EmailService
 from cloudshell.orch.training.services.sandbox_api import SandboxAPIService
 from cloudshell.orch.training.services.sandbox_lifecycle import SandboxLifecycleService
 from cloudshell.orch.training.services.sandbox_output import SandboxOutputService
+from cloudshell.orch.training.services.sandbox_readiness import SandboxReadinessPoller, SandboxReadinessResult
 from cloudshell.orch.training.services.student_links import StudentLinksProvider
+from cloudshell.orch.training.services.users_progress import UsersProgressReporter, UserProgressStates
 from cloudshell.orch.training.services.users_data_manager import UsersDataManagerService,\
     UsersDataManagerServiceKeys as userDataKeys
+from cloudshell.orch.training.utils.parallel import ParallelUtils, ParallelTaskResult
 
 
 class UserSandboxesLogic:
 
-    def __init__(self, env_data: TrainingEnvironmentDataModel, sandbox_output_service: SandboxOutputService,
-                 users_data_manager: UsersDataManagerService, sandbox_create_service: SandboxLifecycleService,
-                 email_service: EmailService, student_links_provider: StudentLinksProvider,
-                 apps_service: SandboxComponentsHelperService):
+    def __init__(self, env_data: TrainingEnvironmentDataModel, config: TrainingWorkflowConfig,
+                 sandbox_output_service: SandboxOutputService, users_data_manager: UsersDataManagerService,
+                 sandbox_create_service: SandboxLifecycleService, email_service: EmailService,
+                 student_links_provider: StudentLinksProvider, apps_service: SandboxComponentsHelperService,
+                 readiness_poller: SandboxReadinessPoller, positions_updater: ResourcePositionsUpdater,
+                 reservation_snapshot: ReservationSnapshotService):
         self._env_data = env_data
+        self._config = config
         self._sandbox_output = sandbox_output_service
         self._users_data = users_data_manager
         self._sandbox_create_service = sandbox_create_service
         self._email_service = email_service
         self._student_links_provider = student_links_provider
         self._apps_service = apps_service
+        self._readiness_poller = readiness_poller
+        self._positions_updater = positions_updater
+        self._reservation_snapshot = reservation_snapshot
+        # EmailService updates its template parameters in place so emails must not be sent concurrently
+        self._email_lock = Lock()
+        self._progress = UsersProgressReporter(sandbox_output_service, config.progress_report_interval)
 
     def create_user_sandboxes(self, sandbox, components):
 
@@ -37,50 +53,160 @@ class UserSandboxesLogic:
 
         self._sandbox_output.notify("Creating User Sandboxes")
         sandbox.logger.info("Starting to the User Sandboxes creation process")
+        self._progress.track(self._env_data.users_list)
 
+        try:
+            self._create_and_prepare_user_sandboxes(sandbox)
+        finally:
+            self._progress.report(force=True)
+            self._sandbox_output.debug_print(self._reservation_snapshot.get_stats_message())
+
+    def _create_and_prepare_user_sandboxes(self, sandbox: Sandbox):
         sandbox_details = self._get_latest_sandbox_details(sandbox)
+        shared_resources = self._get_shared_resources(sandbox)
 
         # Create sandbox for each training user - non blocking, this method will not wait for all sandboxes to be ready
         self._create_user_sandboxes(sandbox, sandbox_details)
 
+        # Share all Student Resources in a single call while the student sandboxes are still provisioning
+        self._share_resources_for_users(sandbox, sandbox_details, shared_resources)
+
+        if self._config.pipelined_user_sandboxes:
+            # Add Student Resources and send the email to each student as soon as its sandbox is "Active"
+            self._prepare_user_sandboxes_as_ready(sandbox, sandbox_details, shared_resources)
+            return
+
         # Wait for student sandboxes to be "Active" and add Student Resources into them
-        self._wait_for_active_sandboxes_and_add_duplicated_resources(sandbox, sandbox_details)
+        results = self._wait_for_active_sandboxes_and_add_duplicated_resources(sandbox, sandbox_details,
+                                                                               shared_resources)
 
-        # Send emails to all users
-        sandbox.logger.info("Starting to Send emails to all users")
-        self._send_emails()
+        # Set the positions of all student resources in all ready student sandboxes at once
+        errors = self._flush_positions_safely(sandbox)
+
+        # Send emails to all users with a ready sandbox before failing the step on the users that failed
+        sandbox.logger.info("Starting to Send emails to all ready users")
+        self._send_emails([result.item for result in results if result.succeeded])
+
+        self._raise_on_users_failures(sandbox, results, "Preparing trainee sandbox", errors)
 
     def _get_latest_sandbox_details(self, sandbox: Sandbox) -> ReservationDescriptionInfo:
-        sandbox.components.refresh_components(sandbox)
-        sandbox_details = sandbox.automation_api.GetReservationDetails(sandbox.id, disableCache=True)
-        return sandbox_details.ReservationDescription
+        # the reservation was changed by the provisioning of the sandbox since the snapshot was taken
+        self._reservation_snapshot.invalidate()
+        self._reservation_snapshot.refresh_components()
+        return self._reservation_snapshot.get_details()
 
-    def _send_emails(self):
+    def _send_emails(self, users: List[str]):
         if self._email_service.is_email_configured():
-            for user in self._env_data.users_list:
-                student_link = self._users_data.get_key(user, userDataKeys.STUDENT_LINK)
-                self._email_service.send_email([user], 'Welcome to Training', template_parameters={'sandbox_link': student_link})
-                self._sandbox_output.notify(f'Sending email to {user} with link={student_link}')
+            for user in users:
+                self._send_email(user)
+
+    def _send_email(self, user: str):
+        self._progress.set_state(user, UserProgressStates.SENDING_EMAIL)
+        student_link = self._users_data.get_key(user, userDataKeys.STUDENT_LINK)
+        with self._email_lock:
+            self._email_service.send_email([user], 'Welcome to Training', template_parameters={'sandbox_link': student_link})
+        self._sandbox_output.notify(f'Sending email to {user} with link={student_link}')
+        self._progress.set_state(user, UserProgressStates.READY)
+
+    def _prepare_user_sandboxes_as_ready(self, sandbox: Sandbox, sandbox_details: ReservationDescriptionInfo,
+                                         shared_resources: List[str]):
+        resource_positions_dict = self._get_resource_positions()
+
+        user_sandboxes = {user: self._users_data.get_key(user, userDataKeys.SANDBOX_ID)
+                          for user in self._env_data.users_list}
+
+        def prepare_user_sandbox(readiness: SandboxReadinessResult):
+            self._add_duplicated_resources_to_user_sandbox(sandbox, sandbox_details, readiness,
+                                                           resource_positions_dict, shared_resources)
+            self._positions_updater.flush(readiness.sandbox_id)
+            if self._email_service.is_email_configured():
+                self._send_email(readiness.user)
+            else:
+                self._progress.set_state(readiness.user, UserProgressStates.READY)
+
+        # every ready sandbox is handed to a worker while the poller keeps waiting for the rest of the sandboxes
+        ready_sandboxes = self._readiness_poller.wait_for_sandboxes(user_sandboxes, on_tick=self._progress.report)
+        results = ParallelUtils.run_as_items_arrive(prepare_user_sandbox, ready_sandboxes,
+                                                    self._config.max_concurrency)
+        user_results = [ParallelTaskResult(result.item.user, result.result, result.error) for result in results]
+
+        self._report_positions_stats()
+        self._raise_on_users_failures(sandbox, user_results, "Preparing trainee sandbox")
 
     def _wait_for_active_sandboxes_and_add_duplicated_resources(self, sandbox: Sandbox,
-                                                                sandbox_details: ReservationDescriptionInfo):
+                                                                sandbox_details: ReservationDescriptionInfo,
+                                                                shared_resources: List[str]) -> List[ParallelTaskResult]:
 
-        resource_positions_dict = self._get_resource_positions(sandbox)
-        shared_resources = self._get_shared_resources(sandbox)
+        resource_positions_dict = self._get_resource_positions()
 
-        for user in self._env_data.users_list:
-            user_sandbox_id = self._users_data.get_key(user, userDataKeys.SANDBOX_ID)
-            self._sandbox_create_service.wait_ready(user_sandbox_id, user)
+        user_sandboxes = {user: self._users_data.get_key(user, userDataKeys.SANDBOX_ID)
+                          for user in self._env_data.users_list}
 
-            user_resources = self._get_user_resources(sandbox_details, user)
-            sandbox.automation_api.SetResourceSharedState(sandbox.id, user_resources + shared_resources, isShared=True)
-            sandbox.automation_api.AddResourcesToReservation(user_sandbox_id, user_resources + shared_resources,
-                                                             shared=True)
+        # student sandboxes are handled in the order they become ready and not in the order of the users list
+        results = []
+        for readiness in self._readiness_poller.wait_for_sandboxes(user_sandboxes, on_tick=self._progress.report):
+            try:
+                self._add_duplicated_resources_to_user_sandbox(sandbox, sandbox_details, readiness,
+                                                               resource_positions_dict, shared_resources)
+                # emails are sent only after all trainee sandboxes are ready
+                self._progress.set_state(readiness.user, UserProgressStates.SENDING_EMAIL
+                                         if self._email_service.is_email_configured() else UserProgressStates.READY)
+                results.append(ParallelTaskResult(readiness.user))
+            except Exception as exc:
+                results.append(ParallelTaskResult(readiness.user, error=exc))
+
+        return results
 
-            for resource in user_resources:
-                sandbox.automation_api.SetReservationResourcePosition(user_sandbox_id, resource,
-                                                                      resource_positions_dict[resource].X,
-                                                                      resource_positions_dict[resource].Y)
+    def _flush_positions_safely(self, sandbox: Sandbox) -> List[str]:
+        """
+        Placing the icons is cosmetic, so a failure is reported together with the per-user results and does not
+        hide them
+        :return: a summary of the failure, empty if all positions were set
+        """
+        try:
+            self._positions_updater.flush()
+            return []
+        except Exception as exc:
+            sandbox.logger.exception("Setting the positions of the trainee resources failed")
+            self._sandbox_output.notify(f'<font style="color:red">Setting the positions of the trainee resources '
+                                        f'failed: {exc}</font>')
+            return [f"Setting the positions of the trainee resources failed: {exc}"]
+        finally:
+            self._report_positions_stats()
+
+    def _add_duplicated_resources_to_user_sandbox(self, sandbox: Sandbox, sandbox_details: ReservationDescriptionInfo,
+                                                  readiness: SandboxReadinessResult, resource_positions_dict: Dict,
+                                                  shared_resources: List[str]):
+        if readiness.timed_out:
+            raise Exception('Cannot create student sandbox, timed out waiting for the sandbox to be ready')
+        if not readiness.is_ready:
+            raise Exception(f'Cannot create student sandbox, sandbox status is {readiness.status} and '
+                            f'{readiness.provisioning_status}')
+
+        self._progress.set_state(readiness.user, UserProgressStates.ADDING_RESOURCES)
+        user_resources = self._get_user_resources(sandbox_details, readiness.user)
+        sandbox.automation_api.AddResourcesToReservation(readiness.sandbox_id, user_resources + shared_resources,
+                                                         shared=True)
+        # teardown removes these resources from the student sandbox without fetching its details
+        self._users_data.add_or_update(readiness.user, userDataKeys.ADDED_RESOURCES,
+                                       user_resources + shared_resources)
+
+        for resource in user_resources:
+            self._positions_updater.add(readiness.sandbox_id, resource, resource_positions_dict[resource])
+
+    def _report_positions_stats(self):
+        self._sandbox_output.debug_print(f"Set trainee resources positions using {self._positions_updater.calls_count} "
+                                         f"calls in {self._positions_updater.elapsed_seconds:.2f} seconds")
+
+    def _share_resources_for_users(self, sandbox: Sandbox, sandbox_details: ReservationDescriptionInfo,
+                                   shared_resources: List[str]):
+        resources_to_share = [resource for user in self._env_data.users_list
+                              for resource in self._get_user_resources(sandbox_details, user)]
+        # remove duplicates and keep order
+        resources_to_share = list(dict.fromkeys(resources_to_share + shared_resources))
+        if resources_to_share:
+            sandbox.automation_api.SetResourceSharedState(sandbox.id, resources_to_share, isShared=True)
+            self._reservation_snapshot.invalidate()
 
     def _get_user_resources(self, sandbox_details, user) -> List[str]:
         user_id = self._users_data.get_key(user, userDataKeys.ID)
@@ -88,11 +214,8 @@ class UserSandboxesLogic:
                           resource.Name.startswith(f"{user_id}_")]
         return user_resources
 
-    def _get_resource_positions(self, sandbox: Sandbox):
-        resource_positions = sandbox.automation_api.GetReservationResourcesPositions(sandbox.id).ResourceDiagramLayouts
-        resource_positions_dict = {resource.ResourceName: Position(resource.X, resource.Y) for resource in
-                                   resource_positions}
-        return resource_positions_dict
+    def _get_resource_positions(self) -> Dict[str, Position]:
+        return self._reservation_snapshot.get_resource_positions()
 
     def _get_shared_resources(self, sandbox: Sandbox) -> List[str]:
         # todo run this code against live environment to test that logic is correct - alexa
@@ -110,29 +233,58 @@ class UserSandboxesLogic:
         new_sandbox_duration = self._calculate_user_sandbox_duration(sandbox_details)
 
         sandbox.logger.info("Creating sandboxes per user")
-        for user in self._env_data.users_list:
-            try:
-                # 1. create new trainee sandbox
-                sandbox.logger.info(f"Creating sandbox for {user}")
-                new_sandbox = self._sandbox_create_service.create_trainee_sandbox(
-                    sandbox.reservationContextDetails.environment_path, user,
-                    self._users_data.get_key(user, userDataKeys.ID), new_sandbox_duration)
-
-                # 2. generate student link and to sandbox data
-                sandbox.logger.info(f"Creating token for {user}")
-                student_link_model = self._student_links_provider.create_student_link(user, new_sandbox.Id)
-
-                # 3. save important data to sandbox data
-                self._users_data.add_or_update(user, userDataKeys.TOKEN, student_link_model.token)
-                self._users_data.add_or_update(user, userDataKeys.STUDENT_LINK, student_link_model.student_link)
-                self._users_data.add_or_update(user, userDataKeys.SANDBOX_ID, new_sandbox.Id)
-
-                # 4. notify instructor about trainee link
-                msg = f'<a href="{student_link_model.student_link}" style="font-size:16px">Trainee Sandbox - {user}</a>'
-                self._sandbox_output.notify(f'Trainee link for {user}: {msg}')
-            except CloudShellAPIError as exc:
-                sandbox.logger.exception(f"Creating trainee sandbox for {user} failed - exception occurred")
-                raise
+        results = ParallelUtils.run_in_parallel(
+            lambda user: self._create_user_sandbox(sandbox, user, new_sandbox_duration),
+            self._env_data.users_list, self._config.max_concurrency)
+
+        self._raise_on_users_failures(sandbox, results, "Creating trainee sandbox")
+
+    def _create_user_sandbox(self, sandbox: Sandbox, user: str, new_sandbox_duration: int):
+        try:
+            # 1. create new trainee sandbox
+            self._progress.set_state(user, UserProgressStates.CREATING)
+            sandbox.logger.info(f"Creating sandbox for {user}")
+            new_sandbox = self._sandbox_create_service.create_trainee_sandbox(
+                sandbox.reservationContextDetails.environment_path, user,
+                self._users_data.get_key(user, userDataKeys.ID), new_sandbox_duration)
+
+            # 2. generate student link and to sandbox data
+            sandbox.logger.info(f"Creating token for {user}")
+            student_link_model = self._student_links_provider.create_student_link(user, new_sandbox.Id)
+
+            # 3. save important data to sandbox data
+            self._users_data.add_or_update(user, userDataKeys.TOKEN, student_link_model.token)
+            self._users_data.add_or_update(user, userDataKeys.STUDENT_LINK, student_link_model.student_link)
+            self._users_data.add_or_update(user, userDataKeys.SANDBOX_ID, new_sandbox.Id)
+
+            # 4. notify instructor about trainee link
+            msg = f'<a href="{student_link_model.student_link}" style="font-size:16px">Trainee Sandbox - {user}</a>'
+            self._sandbox_output.notify(f'Trainee link for {user}: {msg}')
+            self._progress.set_state(user, UserProgressStates.PROVISIONING)
+        except CloudShellAPIError as exc:
+            sandbox.logger.exception(f"Creating trainee sandbox for {user} failed - exception occurred")
+            raise
+
+    def _raise_on_users_failures(self, sandbox: Sandbox, results: List[ParallelTaskResult], operation: str,
+                                 errors: List[str] = None):
+        """
+        Report all per-user failures together and fail the step if at least one user failed
+        :param errors: summaries of failures that are not related to a single user, reported with the users failures
+        """
+        errors = list(errors or [])
+        failures = ParallelUtils.get_failures(results)
+
+        for failure in failures:
+            self._progress.set_state(failure.item, UserProgressStates.FAILED)
+            sandbox.logger.error(f"{operation} for {failure.item} failed: {failure.error}")
+            self._sandbox_output.notify(f'<font style="color:red">{operation} for {failure.item} failed: '
+                                        f'{failure.error}</font>')
+
+        if failures:
+            errors.insert(0, ParallelUtils.get_failures_summary(results, operation, "users"))
+
+        if errors:
+            raise Exception("; ".join(errors))
 
     def _calculate_user_sandbox_duration(self, sandbox_details: ReservationDescriptionInfo) -> int:
         """
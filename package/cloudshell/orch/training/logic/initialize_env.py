@@ -6,21 +6,25 @@ from cloudshell.api.cloudshell_api import AttributeNameValue, Connector, Reserva
     NameValuePair
 from cloudshell.workflow.orchestration.sandbox import Sandbox
 
+from cloudshell.orch.training.models.app_duplication_plan import AppDuplicationPlan
 from cloudshell.orch.training.models.config import TrainingWorkflowConfig
 from cloudshell.orch.training.models.position import Position
 from cloudshell.orch.training.models.training_env import TrainingEnvironmentDataModel
 from cloudshell.orch.training.services.ip_increment_strategy import RequestedIPsIncrementStrategy
+from cloudshell.orch.training.services.reservation_snapshot import ReservationSnapshotService
 from cloudshell.orch.training.services.sandbox_components import SandboxComponentsHelperService
 from cloudshell.orch.training.services.sandbox_lifecycle import SandboxLifecycleService
 from cloudshell.orch.training.services.sandbox_output import SandboxOutputService
 from cloudshell.orch.training.services.users import UsersService
 from cloudshell.orch.training.services.users_data_manager import UsersDataManagerService, \
     UsersDataManagerServiceKeys as userDataKeys
+from cloudshell.orch.training.utils.parallel import ParallelUtils
 from cloudshell.email import EmailService
 
 PRIVATE_IP_ATTR = "Private IP"
 
 ConnectorsAttrUpdateRequest = namedtuple('ConnectorsAttrUpdateRequest', ['Source', 'Target', 'AttributeRequests'])
+AppDuplicationRequest = namedtuple('AppDuplicationRequest', ['UserIndex', 'Plan', 'NewAppName'])
 
 
 class InitializeEnvironmentLogic:
@@ -28,7 +32,8 @@ class InitializeEnvironmentLogic:
     def __init__(self, env_data: TrainingEnvironmentDataModel, config: TrainingWorkflowConfig,
                  users_data_manager: UsersDataManagerService, sandbox_output_service: SandboxOutputService,
                  sandbox_components_service: SandboxComponentsHelperService, sandbox_service: SandboxLifecycleService,
-                 users_service: UsersService, ips_increment_provider: RequestedIPsIncrementStrategy):
+                 users_service: UsersService, ips_increment_provider: RequestedIPsIncrementStrategy,
+                 reservation_snapshot: ReservationSnapshotService):
         self._env_data = env_data
         self._config = config
         self._users_data_manager = users_data_manager
@@ -37,6 +42,8 @@ class InitializeEnvironmentLogic:
         self._sandbox_service = sandbox_service
         self._users_service = users_service
         self._ips_increment_provider = ips_increment_provider
+        self._reservation_snapshot = reservation_snapshot
+        self._student_sandbox_emptied = False
 
     def prepare_environment(self, sandbox: Sandbox):
         if self._env_data.instructor_mode:
@@ -44,6 +51,12 @@ class InitializeEnvironmentLogic:
         else:
             self._prepare_student_sandbox(sandbox)
 
+    def is_student_sandbox_emptied(self) -> bool:
+        """
+        :return: True if prepare_environment removed all components from the student sandbox
+        """
+        return self._student_sandbox_emptied
+
     def _prepare_instructor_sandbox(self, sandbox: Sandbox):
         self._create_or_activate_users(sandbox)
         self._duplicate_students_apps(sandbox)
@@ -55,20 +68,20 @@ class InitializeEnvironmentLogic:
         # create a group for the training users in current sandbox domain, will be removed during teardown
         self._users_service.create_training_users_group(sandbox.id, sandbox.reservationContextDetails.domain)
 
-        for user in self._env_data.users_list:
-            self._users_service.create_or_activate_training_user(user)
+        results = self._users_service.create_or_activate_training_users(self._env_data.users_list)
+        ParallelUtils.raise_on_failures(results, "Creating or activating users", "users")
 
         self._users_service.add_training_users_to_group(sandbox.id, self._env_data.users_list)
 
     def _prepare_student_sandbox(self, sandbox: Sandbox):
-        self._sandbox_service.clear_sandbox_components(sandbox)
+        self._student_sandbox_emptied = self._sandbox_service.clear_sandbox_components(sandbox)
 
     def _duplicate_students_apps(self, sandbox: Sandbox):
         sandbox.logger.info("Starting to duplicate student apps process")
         api = sandbox.automation_api
-        sandbox.components.refresh_components(sandbox)
+        self._reservation_snapshot.refresh_components()
         apps = [app.app_request.app_resource for app in sandbox.components.apps.values()]
-        sandbox_details = api.GetReservationDetails(sandbox.id).ReservationDescription
+        sandbox_details = self._reservation_snapshot.get_details()
         app_connectors = self._components_service.get_apps_to_connectors_dict(apps, sandbox_details,
                                                                               sandbox.components.services)
 
@@ -80,19 +93,51 @@ class InitializeEnvironmentLogic:
             self._duplicate_apps(api, apps, app_connectors, sandbox.id))
 
         # execute bulk update for connector attributes
-        for att_change in connectors_attr_updates:
-            api.SetConnectorAttributes(sandbox.id, att_change.Source, att_change.Target, att_change.AttributeRequests)
+        self._set_connectors_attributes(api, sandbox.id, connectors_attr_updates)
+        self._reservation_snapshot.invalidate()
+
+        self._reservation_snapshot.refresh_components()
+        self._sandbox_output.debug_print(self._reservation_snapshot.get_stats_message())
+
+    def _set_connectors_attributes(self, api: CloudShellAPISession, sandbox_id: str,
+                                   connectors_attr_updates: List[ConnectorsAttrUpdateRequest]):
+        # SetConnectorsInReservation cannot set connector attributes, so there is still one call per connector but
+        # every connector is updated only once and the calls run concurrently
+        merged_updates = self._merge_connectors_attr_updates(connectors_attr_updates)
+        self._sandbox_output.debug_print(f"Setting attributes of {len(merged_updates)} connectors")
+
+        def set_connector_attributes(update: ConnectorsAttrUpdateRequest):
+            api.SetConnectorAttributes(sandbox_id, update.Source, update.Target, update.AttributeRequests)
+
+        results = ParallelUtils.run_in_parallel(set_connector_attributes, merged_updates, self._config.max_concurrency)
 
-        sandbox.components.refresh_components(sandbox)
+        ParallelUtils.raise_on_failures(results, "Setting connector attributes", "connectors",
+                                        describe_item=lambda connector: f"{connector.Source}->{connector.Target}")
+
+    def _merge_connectors_attr_updates(self, connectors_attr_updates: List[ConnectorsAttrUpdateRequest]) \
+            -> List[ConnectorsAttrUpdateRequest]:
+        """
+        Merge all updates of the same connector into one update, the last value of an attribute wins
+        """
+        connector_attributes = {}  # type: Dict[Tuple[str, str], Dict[str, AttributeNameValue]]
+        for update in connectors_attr_updates:
+            attributes = connector_attributes.setdefault((update.Source, update.Target), {})
+            for attribute in update.AttributeRequests:
+                attributes[attribute.Name] = attribute
+
+        return [ConnectorsAttrUpdateRequest(source, target, list(attributes.values()))
+                for (source, target), attributes in connector_attributes.items()]
 
     def _duplicate_apps(self, api: CloudShellAPISession, apps: List[ReservationAppResource],
                         app_connectors: Dict[str, List[Connector]], sandbox_id: str) \
             -> List[ConnectorsAttrUpdateRequest]:
 
-        apps_to_duplicate = self._components_service.get_apps_to_duplicate(apps)
-        service_app_positions_dict = self._components_service.get_service_and_app_name_to_position_dict(api, sandbox_id)
+        # everything that does not depend on the user is computed once per app, shared apps are not duplicated
+        duplication_plans = [self._create_duplication_plan(app)
+                             for app in self._components_service.get_apps_to_duplicate(apps)]
+        service_app_positions_dict = self._reservation_snapshot.get_service_positions()
 
-        app_edit_requests = []
+        duplication_requests = []
         set_connector_requests = []
         connectors_attr_updates = []
 
@@ -101,15 +146,11 @@ class InitializeEnvironmentLogic:
             user_id = str(user_index + 1)
             self._users_data_manager.add_or_update(user, userDataKeys.ID, user_id)
 
-            for app in apps_to_duplicate:
-                self._sandbox_output.debug_print(f"Duplicating app {app.Name} for user #{user_id}")
+            for plan in duplication_plans:
+                app = plan.app
                 # create new name for duplicate app based on user id
                 new_app_name = f"{user_id}_{app.Name}"
-                # duplicate app and get request for update to be called in batch later
-                app_edit_requests.append(
-                    self._duplicate_app_and_get_update_request(api, new_app_name, app, sandbox_id,
-                                                               service_app_positions_dict[app.Name],
-                                                               user_index))
+                duplication_requests.append(AppDuplicationRequest(user_index, plan, new_app_name))
                 # duplicate all connectors for duplicated app with all attributes
                 app_set_connector_requests, app_connectors_attr_updates = \
                     self._create_duplicate_app_connectors_requests(app, app_connectors[app.Name], new_app_name)
@@ -117,14 +158,55 @@ class InitializeEnvironmentLogic:
                 set_connector_requests.extend(app_set_connector_requests)
                 connectors_attr_updates.extend(app_connectors_attr_updates)
 
+        # duplicate apps concurrently and get requests for update to be called in batch later, names and positions
+        # depend only on the user index and the app so the order of the calls does not matter
+        app_edit_requests = self._duplicate_apps_concurrently(api, duplication_requests, sandbox_id,
+                                                              service_app_positions_dict)
+
         # run bulk update requests
         if app_edit_requests:
             api.EditAppsInReservation(sandbox_id, app_edit_requests)
         if set_connector_requests:
             api.SetConnectorsInReservation(sandbox_id, set_connector_requests)
+        if app_edit_requests or set_connector_requests:
+            self._reservation_snapshot.invalidate()
 
         return connectors_attr_updates
 
+    def _duplicate_apps_concurrently(self, api: CloudShellAPISession, duplication_requests: List[AppDuplicationRequest],
+                                     sandbox_id: str, service_app_positions_dict: Dict[str, Position]) \
+            -> List[ApiEditAppRequest]:
+
+        def duplicate_app(request: AppDuplicationRequest) -> ApiEditAppRequest:
+            app_name = request.Plan.app.Name
+            self._sandbox_output.debug_print(f"Duplicating app {app_name} for user #{request.UserIndex + 1}")
+            return self._duplicate_app_and_get_update_request(api, request.NewAppName, request.Plan, sandbox_id,
+                                                              service_app_positions_dict[app_name],
+                                                              request.UserIndex)
+
+        results = ParallelUtils.run_in_parallel(duplicate_app, duplication_requests, self._config.max_concurrency)
+
+        ParallelUtils.raise_on_failures(results, "Duplicating apps", "apps",
+                                        describe_item=lambda request: request.NewAppName)
+
+        return [result.result for result in results]
+
+    def _create_duplication_plan(self, app: ReservationAppResource) -> AppDuplicationPlan:
+        default_deployment = self._components_service.get_default_deployment_option(app)
+
+        private_ips_per_user = None
+        requested_ips_string = self._components_service.get_deployment_attribute_value(default_deployment,
+                                                                                       PRIVATE_IP_ATTR)
+        if requested_ips_string:
+            self._sandbox_output.debug_print(f'original ip for {app.Name} it is: {requested_ips_string}')
+            requested_ips_template = self._ips_increment_provider.parse_requested_ips_string(requested_ips_string)
+            # fails on octet overflow before any app is duplicated
+            private_ips_per_user = self._ips_increment_provider.increment_requested_ips_template_for_users(
+                requested_ips_template, self._config.app_duplicate_increment_octet,
+                [self._calculate_IP_increment(user_index) for user_index in range(len(self._env_data.users_list))])
+
+        return AppDuplicationPlan(app, default_deployment, private_ips_per_user)
+
     # todo move to components service?
     def _create_duplicate_app_connectors_requests(self, app: ReservationAppResource, app_connectors: List[Connector],
                                                   new_app_name: str) -> Tuple[List[SetConnectorRequest],
@@ -154,43 +236,36 @@ class InitializeEnvironmentLogic:
         return set_connector_requests, connectors_attr_updates
 
     def _duplicate_app_and_get_update_request(self, api: CloudShellAPISession, new_app_name: str,
-                                              app: ReservationAppResource, sandbox_id: str, app_pos: Position,
+                                              plan: AppDuplicationPlan, sandbox_id: str, app_pos: Position,
                                               user_index: int) -> ApiEditAppRequest:
         # add duplicate app in new position
-        default_deployment_option_name = self._components_service.get_default_deployment_option(app).Name
         new_app_pos = self._calculate_duplicate_app_position(app_pos, user_index)
-        new_app = api.AddAppToReservation(reservationId=sandbox_id, appName=app.AppTemplateName,
-                                          deploymentPath=default_deployment_option_name,
+        new_app = api.AddAppToReservation(reservationId=sandbox_id, appName=plan.app.AppTemplateName,
+                                          deploymentPath=plan.default_deployment.Name,
                                           positionX=new_app_pos.X, positionY=new_app_pos.Y)
 
         # todo - update all attributes in new app from original app. At the moment we only update Private IP attr but
         #  if other attributes were changed on the reservation app the duplicate will not get it because we are adding
         #  the duplicate from the app template
-        new_private_ip_attr_val = self._get_private_ip_value_for_duplicate_app(app, user_index)
+        new_private_ip_attr_val = self._get_private_ip_value_for_duplicate_app(plan, user_index)
 
         attributes_to_update = [NameValuePair(PRIVATE_IP_ATTR, new_private_ip_attr_val)] \
             if new_private_ip_attr_val else []
 
         # update new app with new name and with updated value to Private IP attribute
         return self._components_service.create_update_app_request(
-            new_app.ReservedAppName, new_app_name, self._components_service.get_default_deployment_option(app),
-            attributes_to_update)
+            new_app.ReservedAppName, new_app_name, plan.default_deployment, attributes_to_update)
 
     def _calculate_duplicate_app_position(self, app_pos: Position, user_index: int) -> Position:
         return Position(app_pos.X, app_pos.Y + 100 * (user_index + 1))
 
-    def _get_private_ip_value_for_duplicate_app(self, app: ReservationAppResource, user_index: int) -> Optional[str]:
-        default_deployment_path = self._components_service.get_default_deployment_option(app)
-        requested_ips_string = self._components_service.get_deployment_attribute_value(default_deployment_path,
-                                                                                       PRIVATE_IP_ATTR)
-        if not requested_ips_string:
+    def _get_private_ip_value_for_duplicate_app(self, plan: AppDuplicationPlan, user_index: int) -> Optional[str]:
+        if not plan.private_ips_per_user:
             return None
 
         # todo - add validation to check if we have a range bigger then the increment
 
-        self._sandbox_output.debug_print(f'original ip for {app.Name} it is: {requested_ips_string}')
-        incremented_ips_string = self._ips_increment_provider.increment_requested_ips_string(
-            requested_ips_string, self._config.app_duplicate_increment_octet, self._calculate_IP_increment(user_index))
+        incremented_ips_string = plan.private_ips_per_user[user_index]
         self._sandbox_output.debug_print(f"incremented requested ips: {incremented_ips_string}")
 
         return incremented_ips_string
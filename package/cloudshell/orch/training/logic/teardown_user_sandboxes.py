@@ -1,5 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
 from cloudshell.workflow.orchestration.sandbox import Sandbox
 
+from cloudshell.orch.training.models.config import TrainingWorkflowConfig
 from cloudshell.orch.training.models.training_env import TrainingEnvironmentDataModel
 from cloudshell.orch.training.services.sandbox_api import SandboxAPIService
 from cloudshell.orch.training.services.sandbox_output import SandboxOutputService
@@ -7,19 +11,22 @@ from cloudshell.orch.training.services.sandbox_lifecycle import SandboxLifecycle
 from cloudshell.orch.training.services.users import UsersService
 from cloudshell.orch.training.services.users_data_manager import UsersDataManagerService, \
     UsersDataManagerServiceKeys as userDataKeys
+from cloudshell.orch.training.utils.parallel import ParallelUtils, ParallelTaskResult
 
 
 class SandboxTerminateLogic:
 
     def __init__(self, sandbox_output: SandboxOutputService, sandbox_api_service: SandboxAPIService,
                  sandbox_lifecycle_service: SandboxLifecycleService, users_data_manager: UsersDataManagerService,
-                 training_env: TrainingEnvironmentDataModel, users_service: UsersService):
+                 training_env: TrainingEnvironmentDataModel, users_service: UsersService,
+                 config: TrainingWorkflowConfig):
         self._sandbox_output = sandbox_output
         self._sandbox_api = sandbox_api_service
         self._sandbox_lifecycle_service = sandbox_lifecycle_service
         self._users_data_manager = users_data_manager
         self._training_env = training_env
         self._users_service = users_service
+        self._config = config
 
     def _delete_students_group(self, instructor_sandbox: Sandbox) -> None:
         self._users_service.delete_training_users_group(instructor_sandbox.id)
@@ -33,23 +40,121 @@ class SandboxTerminateLogic:
             self._teardown_student_sandboxes_inner(sandbox)
         except:
             sandbox.logger.exception('Error in "teardown_student_sandboxes"')
+            # write buffered messages before the error message
+            self._flush_output_safely(sandbox)
             sandbox.automation_api.WriteMessageToReservationOutput(
                 sandbox.id, '<font style="color:red">Error during teardown of student sandboxes. '
                             'Please check logs for more details"</font>')
+        finally:
+            self._flush_output_safely(sandbox)
+
+    def _flush_output_safely(self, sandbox: Sandbox):
+        try:
+            self._sandbox_output.flush()
+        except:
+            sandbox.logger.exception('Failed to write buffered messages to sandbox output')
 
     def _teardown_student_sandboxes_inner(self, sandbox: Sandbox):
         sandbox.logger.info("Starting tearing down process")
-        # todo - move to workflow or some singleton provider?
-        admin_token = self._sandbox_api.login()
+        users = self._training_env.users_list
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # revoke the tokens first so students lose portal access right away, the Sandbox API requests overlap
+            # with ending the student reservations
+            tokens_future = executor.submit(self._revoke_tokens, sandbox, users)
 
-        for user in self._training_env.users_list:
-            self._sandbox_output.debug_print(f'Preparing sandbox Teardown for user: {user}')
-            self._sandbox_lifecycle_service.end_student_reservation(user, self._training_env.instructor_mode)
+            # every student is torn down independently, a failing student does not stop the others
+            results = ParallelUtils.run_in_parallel(self._teardown_student_sandbox,
+                                                    self._get_users_with_sandbox(sandbox, users),
+                                                    self._config.max_concurrency)
+            token_results = self._as_token_results(tokens_future.result())
 
-            self._sandbox_output.debug_print(f'Deleting Token for user: {user}')
-            self._sandbox_api.delete_token(api_token=admin_token,
-                                           user_token=self._users_data_manager.get_key(user, userDataKeys.TOKEN))
+        revoked_count = len(token_results) - len(ParallelUtils.get_failures(token_results))
+        self._sandbox_output.debug_print(f'Revoked REST API tokens of {revoked_count} out of {len(token_results)} users')
 
+        group_errors = []
+        deactivation_results = []
         if self._training_env.instructor_mode:
+            # deactivate before the group is deleted, so the admin flags of its members are part of the index
+            deactivation_results = self._deactivate_students(sandbox, users)
             sandbox.logger.info("Deleting user group")
-            self._delete_students_group(sandbox)
+            group_errors = self._delete_students_group_safely(sandbox)
+
+        errors = self._report_users_failures(sandbox, "Teardown of student sandbox", results)
+        errors += self._report_users_failures(sandbox, "Revoking REST API token", token_results)
+        errors += self._report_users_failures(sandbox, "Deactivating user", deactivation_results)
+        errors += group_errors
+        if errors:
+            raise Exception(f"Teardown of {len(users)} student sandboxes failed: {'; '.join(errors)}")
+
+    def _delete_students_group_safely(self, instructor_sandbox: Sandbox) -> List[str]:
+        """
+        :return: a summary of the failure, empty if the group was deleted
+        """
+        try:
+            self._delete_students_group(instructor_sandbox)
+            return []
+        except Exception as exc:
+            instructor_sandbox.logger.exception("Deleting training users group failed")
+            self._sandbox_output.notify(f'<font style="color:red">Deleting training users group failed: {exc}</font>')
+            return [f"Deleting training users group failed: {exc}"]
+
+    def _deactivate_students(self, instructor_sandbox: Sandbox, users: List[str]) -> List[ParallelTaskResult]:
+        # admins and users that are members of other groups are skipped by the users service
+        try:
+            deactivation_results = self._users_service.deactivate_training_users(instructor_sandbox.id, users)
+        except Exception as exc:
+            # the groups could not be read, no user was deactivated
+            instructor_sandbox.logger.exception("Deactivating training users failed")
+            deactivation_results = [ParallelTaskResult(user, error=exc) for user in users]
+        deactivated_count = len(deactivation_results) - len(ParallelUtils.get_failures(deactivation_results))
+        self._sandbox_output.debug_print(f'Deactivated {deactivated_count} out of {len(users)} users')
+        return deactivation_results
+
+    def _get_users_with_sandbox(self, sandbox: Sandbox, users: List[str]) -> List[str]:
+        if not self._training_env.instructor_mode:
+            return users
+
+        # the sandbox creation of these users failed during setup, there is nothing to tear down
+        users_with_sandbox = [user for user in users
+                              if self._users_data_manager.get_key(user, userDataKeys.SANDBOX_ID)]
+        skipped_users = [user for user in users if user not in users_with_sandbox]
+        if skipped_users:
+            sandbox.logger.debug(f"Skipping teardown of users without a student sandbox: {', '.join(skipped_users)}")
+        return users_with_sandbox
+
+    def _teardown_student_sandbox(self, user: str):
+        self._sandbox_output.debug_print(f'Preparing sandbox Teardown for user: {user}')
+        self._sandbox_lifecycle_service.end_student_reservation(user, self._training_env.instructor_mode)
+
+    def _revoke_tokens(self, sandbox: Sandbox, users: List[str]) -> List[ParallelTaskResult]:
+        all_user_tokens = {user: self._users_data_manager.get_key(user, userDataKeys.TOKEN) for user in users}
+        # the student sandbox has no users data and users whose sandbox creation failed have no token
+        user_tokens = {user: token for user, token in all_user_tokens.items() if token}
+        skipped_users = [user for user, token in all_user_tokens.items() if not token]
+        if skipped_users:
+            sandbox.logger.debug(f"Skipping REST API token revocation of users without a token: "
+                                 f"{', '.join(skipped_users)}")
+        return self._sandbox_api.delete_tokens(user_tokens)
+
+    def _as_token_results(self, delete_results: List[ParallelTaskResult]) -> List[ParallelTaskResult]:
+        # delete_token returns False when the Sandbox API rejected the request, count it as a failure
+        return [ParallelTaskResult(result.item, error=Exception("Sandbox API did not delete the token"))
+                if result.succeeded and not result.result else result
+                for result in delete_results]
+
+    def _report_users_failures(self, sandbox: Sandbox, operation: str, results: List[ParallelTaskResult]) -> List[str]:
+        """
+        Log and notify every failed user
+        :return: a summary of the failures, empty if no user failed
+        """
+        failures = ParallelUtils.get_failures(results)
+        if not failures:
+            return []
+
+        for failure in failures:
+            sandbox.logger.error(f"{operation} for {failure.item} failed: {failure.error}")
+            self._sandbox_output.notify(f'<font style="color:red">{operation} for {failure.item} '
+                                        f'failed: {failure.error}</font>')
+
+        return [ParallelUtils.get_failures_summary(results, operation, "users")]
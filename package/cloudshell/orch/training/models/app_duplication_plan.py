@@ -0,0 +1,19 @@
+from typing import List, Optional
+
+from cloudshell.api.cloudshell_api import ReservationAppResource, DeploymentPathInfo
+
+
+class AppDuplicationPlan:
+    """
+    Everything needed to duplicate an app for a user, computed once per app so the work per user stays small
+    """
+
+    def __init__(self, app: ReservationAppResource, default_deployment: DeploymentPathInfo,
+                 private_ips_per_user: Optional[List[str]] = None):
+        """
+        :param private_ips_per_user: incremented Private IP of the duplicate app of every user by user index, None if
+        Private IP is not set
+        """
+        self.app = app
+        self.default_deployment = default_deployment
+        self.private_ips_per_user = private_ips_per_user
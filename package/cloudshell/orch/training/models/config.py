@@ -1,5 +1,6 @@
 from typing import Dict
 
+from cloudshell.orch.training.models.polling_policy import PollingPolicy
 from cloudshell.orch.training.services.ip_increment_strategy import RequestedIPsIncrementStrategy
 from cloudshell.email import EmailConfig
 from cloudshell.orch.training.services.ips_handler import IPsHandlerService
@@ -9,19 +10,50 @@ from cloudshell.orch.training.services.ips_handler import IPsHandlerService
 class TrainingWorkflowConfig:
     def __init__(self, training_portal_base_url: str = '', sandbox_api_port: int = 82,
                  app_duplicate_ip_increment: int = 10, app_duplicate_increment_octet: str = '/24',
-                 email_config: EmailConfig = None):
+                 email_config: EmailConfig = None, max_concurrency: int = 10,
+                 pipelined_user_sandboxes: bool = False, sandbox_api_connect_timeout: float = 5,
+                 sandbox_api_read_timeout: float = 30, buffered_output: bool = False,
+                 output_flush_interval: float = 2, output_max_buffered_messages: int = 20,
+                 progress_report_interval: float = 30, polling_policy: PollingPolicy = None,
+                 print_power_off_output: bool = False):
         """
         :param training_portal_base_url: Base url for training portal including port
         :param sandbox_api_port:
+        :param sandbox_api_connect_timeout: seconds to wait for a connection to the Sandbox API
+        :param sandbox_api_read_timeout: seconds to wait for a response from the Sandbox API
         :param email_config: if None emails to training users will not be sent
+        :param max_concurrency: max number of users (or API calls) handled in parallel, 1 disables concurrency
+        :param pipelined_user_sandboxes: if True every trainee sandbox gets its resources and email as soon as it is
+        ready, instead of waiting for all trainee sandboxes before sending emails
+        :param buffered_output: if True messages to the sandbox output are collected and written in combined writes
+        :param output_flush_interval: max seconds a message stays in the buffer when buffered_output is True
+        :param output_max_buffered_messages: number of buffered messages that triggers a write when buffered_output
+        is True
+        :param progress_report_interval: min seconds between two progress summaries of the trainee sandboxes
+        :param polling_policy: intervals and deadline for polling the status of trainee sandboxes, if None the
+        default policy is used
+        :param print_power_off_output: if True the output of powering off shared apps at teardown of a student
+        sandbox is written to the sandbox output
         """
         self.training_portal_base_url = training_portal_base_url
         self.sandbox_api_port = sandbox_api_port
+        self.sandbox_api_connect_timeout = sandbox_api_connect_timeout
+        self.sandbox_api_read_timeout = sandbox_api_read_timeout
         self.app_duplicate_ip_increment = app_duplicate_ip_increment
         self.app_duplicate_increment_octet = app_duplicate_increment_octet
         self.email_config = email_config
+        self.max_concurrency = max_concurrency
+        self.pipelined_user_sandboxes = pipelined_user_sandboxes
+        self.buffered_output = buffered_output
+        self.output_flush_interval = output_flush_interval
+        self.output_max_buffered_messages = output_max_buffered_messages
+        self.progress_report_interval = progress_report_interval
+        self.polling_policy = polling_policy or PollingPolicy()
+        self.print_power_off_output = print_power_off_output
 
         self._validate()
 
     def _validate(self):
-        IPsHandlerService.validate_increment_octet(self.app_duplicate_increment_octet)
\ No newline at end of file
+        IPsHandlerService.validate_increment_octet(self.app_duplicate_increment_octet)
+        if self.max_concurrency < 1:
+            raise ValueError(f'max_concurrency must be a positive number, got {self.max_concurrency}')
\ No newline at end of file
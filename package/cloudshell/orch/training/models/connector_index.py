@@ -0,0 +1,25 @@
+from typing import Dict, Iterable, List
+
+from cloudshell.api.cloudshell_api import Connector
+
+
+class ConnectorIndex:
+    """
+    Connectors between endpoints and services indexed by endpoint name, built in a single pass over the connectors
+    """
+
+    def __init__(self, connectors: Iterable[Connector], service_names: Iterable[str]):
+        service_names = set(service_names)
+        self._service_connectors = {}  # type: Dict[str, List[Connector]]
+
+        for connector in connectors:
+            if connector.Target in service_names:
+                self._service_connectors.setdefault(connector.Source, []).append(connector)
+            if connector.Source in service_names and connector.Source != connector.Target:
+                self._service_connectors.setdefault(connector.Target, []).append(connector)
+
+    def get_service_connectors(self, endpoint: str) -> List[Connector]:
+        """
+        :return: connectors between the endpoint and services, in the order of the sandbox connectors
+        """
+        return self._service_connectors.get(endpoint, [])
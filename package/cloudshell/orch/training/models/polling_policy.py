@@ -0,0 +1,43 @@
+import random
+
+
+class PollingPolicy:
+    def __init__(self, initial_interval: float = 2, max_interval: float = 30, backoff_factor: float = 2,
+                 jitter: float = 0.2, deadline: float = None):
+        """
+        :param initial_interval: seconds to wait before the second poll, fast sandboxes are detected sooner
+        :param max_interval: upper bound in seconds for the interval between two polls
+        :param backoff_factor: the interval is multiplied by this factor after every poll
+        :param jitter: fraction of the interval that is randomly added or subtracted, so orchestrations that
+        started together do not poll in lockstep. 0 disables jitter
+        :param deadline: max seconds to wait in total, None waits forever
+        """
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.deadline = deadline
+
+        self._validate()
+
+    def get_interval(self, attempt: int) -> float:
+        """
+        :param attempt: zero based number of polls done so far
+        :return: seconds to sleep before the next poll
+        """
+        interval = min(self.initial_interval * self.backoff_factor ** attempt, self.max_interval)
+        if self.jitter:
+            interval *= 1 + random.uniform(-self.jitter, self.jitter)
+        return interval
+
+    def is_deadline_exceeded(self, elapsed: float) -> bool:
+        return self.deadline is not None and elapsed >= self.deadline
+
+    def _validate(self):
+        if self.initial_interval <= 0 or self.max_interval < self.initial_interval:
+            raise ValueError(f'polling intervals must be positive and max_interval must not be smaller than '
+                             f'initial_interval, got {self.initial_interval} and {self.max_interval}')
+        if self.backoff_factor < 1:
+            raise ValueError(f'backoff_factor must be at least 1, got {self.backoff_factor}')
+        if not 0 <= self.jitter < 1:
+            raise ValueError(f'jitter must be between 0 and 1, got {self.jitter}')
@@ -1,7 +1,15 @@
 import logging
+from collections import namedtuple
+from ipaddress import IPv4Address
+from typing import List
+
 from cloudshell.cp.core.requested_ips.validator import RequestedIPsValidator
 
-from cloudshell.orch.training.services.ips_handler import IPsHandlerService
+from cloudshell.orch.training.services.ips_handler import IPsHandlerService, ALLOWED_INCREMENT_OCTET_LIST
+
+# a single requested IP or IP range from a requested IPs string compiled to integers. Address is the IPv4 address as
+# an integer, RangeEnd is the last octet of the range end or None for a single IP
+RequestedIP = namedtuple('RequestedIP', ['Address', 'RangeEnd'])
 
 
 class RequestedIPsIncrementStrategy:
@@ -23,6 +31,79 @@ class RequestedIPsIncrementStrategy:
 
         return ';'.join(new_ips)
 
+    def parse_requested_ips_string(self, requested_ips_string: str) -> List[List[RequestedIP]]:
+        """
+        Validate and compile a requested IPs string once into integer addresses, so it can be incremented for many
+        users without parsing it again
+        :return: requested IPs for every NIC
+        """
+        template = []
+
+        for ip_req_for_nic in requested_ips_string.split(";"):
+            nic_requested_ips = []
+            for ip_req_single in ip_req_for_nic.split(','):
+                ip_req_single = ip_req_single.strip()
+                if RequestedIPsValidator.is_range(ip_req_single):
+                    address, range_end = ip_req_single.split('-')
+                    nic_requested_ips.append(RequestedIP(int(IPv4Address(address)), int(range_end)))
+                else:
+                    nic_requested_ips.append(RequestedIP(int(IPv4Address(ip_req_single)), None))
+            template.append(nic_requested_ips)
+
+        return template
+
+    def increment_requested_ips_template_for_users(self, template: List[List[RequestedIP]], increment_octet: str,
+                                                   increment_sizes: List[int]) -> List[str]:
+        """
+        Generate the requested IPs strings of many users in a single pass over the compiled template.
+        Raises ValueError before generating anything if any increment overflows the incremented octet
+        :param increment_sizes: increment size of every user
+        :return: requested IPs string of every user, in the order of increment_sizes
+        """
+        IPsHandlerService.validate_increment_octet(increment_octet)
+        if not increment_sizes:
+            return []
+
+        octet_shift = 8 * ALLOWED_INCREMENT_OCTET_LIST.index(increment_octet)
+        for nic_requested_ips in template:
+            for requested_ip in nic_requested_ips:
+                self._validate_no_octet_overflow(requested_ip, increment_octet, octet_shift, min(increment_sizes),
+                                                 max(increment_sizes))
+
+        # strings of every requested IP for all users, in the structure of the template
+        incremented_template = [[self._increment_requested_ip_for_users(requested_ip, increment_octet, octet_shift,
+                                                                        increment_sizes)
+                                 for requested_ip in nic_requested_ips]
+                                for nic_requested_ips in template]
+
+        return [';'.join(','.join(requested_ip_per_user[user_index] for requested_ip_per_user in nic_requested_ips)
+                         for nic_requested_ips in incremented_template)
+                for user_index in range(len(increment_sizes))]
+
+    def _increment_requested_ip_for_users(self, requested_ip: RequestedIP, increment_octet: str, octet_shift: int,
+                                          increment_sizes: List[int]) -> List[str]:
+        addresses = [str(IPv4Address(requested_ip.Address + (increment_size << octet_shift)))
+                     for increment_size in increment_sizes]
+        if requested_ip.RangeEnd is None:
+            return addresses
+
+        # increment the range only if 'increment_octet' is /24
+        if increment_octet == '/24':
+            return [f'{address}-{requested_ip.RangeEnd + increment_size}'
+                    for address, increment_size in zip(addresses, increment_sizes)]
+        return [f'{address}-{requested_ip.RangeEnd}' for address in addresses]
+
+    def _validate_no_octet_overflow(self, requested_ip: RequestedIP, increment_octet: str, octet_shift: int,
+                                    min_increment_size: int, max_increment_size: int):
+        octet_values = [(requested_ip.Address >> octet_shift) & 0xFF]
+        if requested_ip.RangeEnd is not None and increment_octet == '/24':
+            octet_values.append(requested_ip.RangeEnd)
+
+        for octet_value in octet_values:
+            if octet_value + min_increment_size < 0 or octet_value + max_increment_size > 255:
+                raise ValueError(f'Incrementing requested IP {IPv4Address(requested_ip.Address)} in octet '
+                                 f'{increment_octet} by up to {max_increment_size} exceeds the octet range 0-255')
+
     def _increment_ip_req_for_nic(self, ip_req_for_nic: str, increment_octet: str, increment_size: int) -> str:
         new_ips_list = []
 
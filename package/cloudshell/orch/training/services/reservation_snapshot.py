@@ -0,0 +1,128 @@
+from threading import Lock
+from typing import Any, Callable, Dict, List
+
+from cloudshell.api.cloudshell_api import GetReservationDescriptionResponseInfo, ReservationDescriptionInfo, AppInfo
+from cloudshell.workflow.orchestration.app import App
+from cloudshell.workflow.orchestration.sandbox import Sandbox
+
+from cloudshell.orch.training.models.position import Position
+from cloudshell.orch.training.utils.parallel import ParallelUtils
+
+
+class ReservationSnapshotService:
+    """
+    Fetches the reservation details, resource positions and service positions of the sandbox once and serves them
+    until invalidate() is called. Callers must invalidate the snapshot after calls that change the reservation.
+    This service is thread safe
+    """
+
+    def __init__(self, sandbox: Sandbox):
+        self._sandbox = sandbox
+        self._api = sandbox.automation_api
+        self._lock = Lock()
+        self._details_response = None  # type: GetReservationDescriptionResponseInfo
+        self._resource_positions = None  # type: Dict[str, Position]
+        self._service_positions = None  # type: Dict[str, Position]
+        self._components_refreshed = False
+        self.fetches_count = 0
+        self.avoided_fetches_count = 0
+
+    def prefetch(self, max_concurrency: int, other_reads: List[Callable[[], Any]] = ()) -> List[Any]:
+        """
+        Fetch the details and the positions concurrently together with other independent reads
+        :param other_reads: reads of other services that are issued together with the snapshot fetches
+        :return: the results of other_reads, in the same order
+        """
+        sandbox_id = self._sandbox.id
+        reads = [lambda: self._api.GetReservationDetails(sandbox_id, disableCache=True),
+                 lambda: self._api.GetReservationResourcesPositions(sandbox_id),
+                 lambda: self._api.GetReservationServicesPositions(sandbox_id)] + list(other_reads)
+
+        results = ParallelUtils.run_in_parallel(lambda read: read(), reads, max_concurrency)
+
+        failures = ParallelUtils.get_failures(results)
+        if failures:
+            raise failures[0].error
+
+        details_response, resource_layouts, service_layouts = [result.result for result in results[:3]]
+        with self._lock:
+            self.fetches_count += 3
+            self._details_response = details_response
+            self._resource_positions = self._to_positions_dict(resource_layouts.ResourceDiagramLayouts)
+            self._service_positions = self._to_positions_dict(service_layouts.ResourceDiagramLayouts)
+            self._components_refreshed = False
+
+        return [result.result for result in results[3:]]
+
+    def get_details(self) -> ReservationDescriptionInfo:
+        with self._lock:
+            return self._get_details_response().ReservationDescription
+
+    def get_resource_positions(self) -> Dict[str, Position]:
+        with self._lock:
+            if self._resource_positions is None:
+                layouts = self._fetch(self._api.GetReservationResourcesPositions, self._sandbox.id)
+                self._resource_positions = self._to_positions_dict(layouts.ResourceDiagramLayouts)
+            else:
+                self.avoided_fetches_count += 1
+            return self._resource_positions
+
+    def get_service_positions(self) -> Dict[str, Position]:
+        with self._lock:
+            if self._service_positions is None:
+                layouts = self._fetch(self._api.GetReservationServicesPositions, self._sandbox.id)
+                self._service_positions = self._to_positions_dict(layouts.ResourceDiagramLayouts)
+            else:
+                self.avoided_fetches_count += 1
+            return self._service_positions
+
+    def refresh_components(self):
+        """
+        Refresh sandbox.components from the snapshot details instead of fetching the details again. Same as
+        Components.refresh_components: resources and services are replaced, new apps are added and deployed app
+        resources are set on their apps
+        """
+        with self._lock:
+            if self._components_refreshed:
+                self.avoided_fetches_count += 1
+                return
+            details = self._get_details_response().ReservationDescription
+            components = self._sandbox.components
+
+            components.resources = {resource.Name: resource for resource in details.Resources}
+            components.services = {service.Alias: service for service in details.Services}
+            for app in details.Apps or []:
+                # apps without deployment paths are skipped, the automation api can return an app named None
+                if app.Name not in components.apps and len(app.DeploymentPaths) > 0:
+                    components.apps[app.Name] = App(app)
+            for resource in components.resources.values():
+                if isinstance(resource.AppDetails, AppInfo) and resource.AppDetails.AppName in components.apps:
+                    components.apps[resource.AppDetails.AppName].set_deployed_app_resource(resource)
+
+            self._components_refreshed = True
+
+    def invalidate(self):
+        with self._lock:
+            self._details_response = None
+            self._resource_positions = None
+            self._service_positions = None
+            self._components_refreshed = False
+
+    def get_stats_message(self) -> str:
+        return f"Reservation snapshot made {self.fetches_count} fetches and avoided {self.avoided_fetches_count}"
+
+    def _get_details_response(self) -> GetReservationDescriptionResponseInfo:
+        # must be called while holding the lock
+        if self._details_response is None:
+            self._details_response = self._fetch(self._api.GetReservationDetails, self._sandbox.id, disableCache=True)
+        else:
+            self.avoided_fetches_count += 1
+        return self._details_response
+
+    def _fetch(self, api_call, *args, **kwargs):
+        self.fetches_count += 1
+        return api_call(*args, **kwargs)
+
+    def _to_positions_dict(self, layouts) -> Dict[str, Position]:
+        return {layout.ResourceName: Position(layout.X, layout.Y) for layout in layouts}
+
@@ -0,0 +1,63 @@
+from threading import Lock
+from time import monotonic
+from typing import Dict, List, Tuple
+
+from cloudshell.workflow.orchestration.sandbox import Sandbox
+
+from cloudshell.orch.training.models.position import Position
+from cloudshell.orch.training.utils.parallel import ParallelUtils
+
+
+class ResourcePositionsUpdater:
+    """
+    Accumulates resource positions per reservation and sets them concurrently on flush.
+    The API has no bulk call for resource positions, so every placement is still a single API call.
+    This service is thread safe
+    """
+
+    def __init__(self, sandbox: Sandbox, max_concurrency: int):
+        self._api = sandbox.automation_api
+        self._max_concurrency = max_concurrency
+        self._lock = Lock()
+        self._pending = {}  # type: Dict[str, Dict[str, Position]]
+        self.calls_count = 0
+        self.elapsed_seconds = 0.0
+
+    def add(self, reservation_id: str, resource_name: str, position: Position):
+        with self._lock:
+            self._pending.setdefault(reservation_id, {})[resource_name] = position
+
+    def flush(self, reservation_id: str = None):
+        """
+        Set all accumulated positions, or only the positions of the given reservation.
+        The positions of a single reservation are set serially since that flush is called from the workers that
+        prepare the trainee sandboxes, which already use the whole concurrency budget
+        """
+        placements = self._pop_placements(reservation_id)
+        if not placements:
+            return
+
+        max_workers = 1 if reservation_id else self._max_concurrency
+        start_time = monotonic()
+        results = ParallelUtils.run_in_parallel(self._set_position, placements, max_workers)
+        elapsed = monotonic() - start_time
+
+        with self._lock:
+            self.calls_count += len(placements)
+            self.elapsed_seconds += elapsed
+
+        ParallelUtils.raise_on_failures(results, "Setting position", "resources",
+                                        describe_item=lambda placement: placement[1])
+
+    def _pop_placements(self, reservation_id: str = None) -> List[Tuple[str, str, Position]]:
+        with self._lock:
+            reservation_ids = [reservation_id] if reservation_id else list(self._pending.keys())
+            placements = []
+            for res_id in reservation_ids:
+                for resource_name, position in self._pending.pop(res_id, {}).items():
+                    placements.append((res_id, resource_name, position))
+            return placements
+
+    def _set_position(self, placement: Tuple[str, str, Position]):
+        reservation_id, resource_name, position = placement
+        self._api.SetReservationResourcePosition(reservation_id, resource_name, position.X, position.Y)
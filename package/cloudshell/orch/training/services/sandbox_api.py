@@ -1,53 +1,116 @@
+from threading import Lock
+from time import monotonic
+from typing import Callable, Dict, List
+
 import requests
 from cloudshell.workflow.orchestration.sandbox import Sandbox
+from requests.adapters import HTTPAdapter
 
 from cloudshell.orch.training.services.sandbox_output import SandboxOutputService
+from cloudshell.orch.training.utils.parallel import ParallelUtils, ParallelTaskResult
+
+ADMIN_TOKEN_TTL_SECONDS = 10 * 60
 
 
 class SandboxAPIService:
+    """
+    The admin token is cached and shared between calls. This service is thread safe
+    """
 
-    def __init__(self, sandbox: Sandbox, port: int, sandbox_output: SandboxOutputService):
+    def __init__(self, sandbox: Sandbox, port: int, sandbox_output: SandboxOutputService, max_concurrency: int = 1,
+                 connect_timeout: float = 5, read_timeout: float = 30):
+        """
+        :param max_concurrency: number of parallel requests in batch operations, also the size of the connection pool
+        :param connect_timeout: seconds to wait for a connection to the Sandbox API
+        :param read_timeout: seconds to wait for a response from the Sandbox API
+        """
         self._port = port
         self._sandbox = sandbox
         self._sandbox_output = sandbox_output
+        self._max_concurrency = max_concurrency
+        self._timeout = (connect_timeout, read_timeout)
 
         self._requests_session = requests.Session()
         self._requests_session.verify = False
+        # keep alive connections are reused between requests, one pooled connection per worker
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self._requests_session.mount('http://', adapter)
+        self._requests_session.mount('https://', adapter)
+
+        self._admin_token_lock = Lock()
+        self._admin_token = None
+        self._admin_token_expiry = 0
 
     def login(self) -> str:
         """
         Login to the Sandbox API as the admin User.
         """
-        r = self._requests_session.put(f'http://{self._sandbox.connectivityContextDetails.server_address}:{self._port}/api/login',
+        r = self._requests_session.put(f'{self._get_base_url()}/api/login',
                                        json={
                                             "username": self._sandbox.connectivityContextDetails.admin_user,
                                             "password": self._sandbox.connectivityContextDetails.admin_pass,
                                             "domain": self._sandbox.reservationContextDetails.domain
-                                       })
+                                       }, timeout=self._timeout)
         return r.json()
 
-    def create_token(self, api_token: str, user: str, domain: str) -> str:
+    def get_admin_token(self) -> str:
+        """
+        Get the cached admin token, login again only if there is no token or the token expired
+        """
+        with self._admin_token_lock:
+            if not self._admin_token or monotonic() >= self._admin_token_expiry:
+                self._admin_token = self.login()
+                self._admin_token_expiry = monotonic() + ADMIN_TOKEN_TTL_SECONDS
+            return self._admin_token
+
+    def create_token(self, user: str, domain: str) -> str:
         """
         Generate a user token for Sandbox API (and Training Portal) for the designated user.
         """
         self._sandbox_output.debug_print("Generating REST API Token")
-        authorization = f"Basic {api_token}"
-        headers = {'Content-type': 'application/json', 'Authorization': authorization}
-        r = self._requests_session.post(f'http://{self._sandbox.connectivityContextDetails.server_address}:{self._port}/api/Token',
-                                        json={"username": user, "domain": domain}, headers=headers)
+        r = self._send_as_admin(self._requests_session.post, f'{self._get_base_url()}/api/Token',
+                                json={"username": user, "domain": domain})
         return r.json()
 
-    def delete_token(self, api_token: str, user_token: str) -> bool:
+    def delete_token(self, user_token: str) -> bool:
         """
         Delete a user token
         """
         self._sandbox_output.debug_print(f"Deleting REST API Token {user_token}")
-        authorization = f"Basic {api_token}"
-        headers = {'Content-type': 'application/json', 'Authorization': authorization}
-        r = self._requests_session.delete(f'http://{self._sandbox.connectivityContextDetails.server_address}:{self._port}'
-            f'/api/Token/{user_token}', headers=headers)
+        r = self._send_as_admin(self._requests_session.delete, f'{self._get_base_url()}/api/Token/{user_token}')
         if r.status_code != 200:
             self._sandbox_output.debug_print("Error deleting token: Code="+str(r.status_code))
             return False
 
         return True
+
+    def delete_tokens(self, user_tokens: Dict[str, str]) -> List[ParallelTaskResult]:
+        """
+        Delete many user tokens in parallel
+        :param user_tokens: user to user token
+        :return: result per user, the result value is True if the token was deleted
+        """
+        return ParallelUtils.run_in_parallel(lambda user: self.delete_token(user_tokens[user]), user_tokens.keys(),
+                                             self._max_concurrency)
+
+    def _send_as_admin(self, send: Callable[..., requests.Response], url: str, **kwargs) -> requests.Response:
+        admin_token = self.get_admin_token()
+        r = send(url, headers=self._get_headers(admin_token), timeout=self._timeout, **kwargs)
+        if r.status_code == 401:
+            # cached admin token was rejected (expired on server side), login again and retry once
+            self._sandbox_output.debug_print("Admin token was rejected by Sandbox API, logging in again")
+            self._invalidate_admin_token(admin_token)
+            r = send(url, headers=self._get_headers(self.get_admin_token()), timeout=self._timeout, **kwargs)
+        return r
+
+    def _invalidate_admin_token(self, admin_token: str):
+        with self._admin_token_lock:
+            # another thread might have already refreshed the token
+            if self._admin_token == admin_token:
+                self._admin_token = None
+
+    def _get_headers(self, admin_token: str) -> dict:
+        return {'Content-type': 'application/json', 'Authorization': f"Basic {admin_token}"}
+
+    def _get_base_url(self) -> str:
+        return f'http://{self._sandbox.connectivityContextDetails.server_address}:{self._port}'
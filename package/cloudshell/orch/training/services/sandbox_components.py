@@ -2,9 +2,9 @@ from typing import List, Dict, Optional
 
 from cloudshell.api.cloudshell_api import ReservationAppResource, NameValuePair, DeploymentPathInfo, \
     ApiEditAppRequest, DefaultDeployment, Deployment, Connector, \
-    ReservationDescriptionInfo, ServiceInstance, CloudShellAPISession
+    ReservationDescriptionInfo, ServiceInstance
 
-from cloudshell.orch.training.models.position import Position
+from cloudshell.orch.training.models.connector_index import ConnectorIndex
 from cloudshell.orch.training.services.sandbox_output import SandboxOutputService
 
 SHARED_ATT_POSTFIX = 'shared'
@@ -81,24 +81,16 @@ class SandboxComponentsHelperService:
     def get_apps_to_connectors_dict(self, apps: List[ReservationAppResource],
                                     sandbox_details: ReservationDescriptionInfo,
                                     services_dict: Dict[str, ServiceInstance]) -> Dict[str, List[Connector]]:
+        # index the connectors once instead of scanning all connectors for every app
+        connector_index = ConnectorIndex(sandbox_details.Connectors, services_dict.keys())
         app_connectors = {}
         for app in apps:
-            app_connectors[app.Name] = []
-            for connector in sandbox_details.Connectors:
-                # All connectors connected to the app and services (not connectors between resources)
-                if (connector.Source == app.Name and connector.Target in services_dict) or \
-                        (connector.Target == app.Name and connector.Source in services_dict):
-                    app_connectors[app.Name].append(connector)
+            # All connectors connected to the app and services (not connectors between resources)
+            app_connectors[app.Name] = list(connector_index.get_service_connectors(app.Name))
             self._sandbox_output.debug_print(
                 f'connectors detected for app {app.Name} are {len(app_connectors[app.Name])}')
         return app_connectors
 
-    def get_service_and_app_name_to_position_dict(self, api: CloudShellAPISession, sandbox_id: str) -> \
-            Dict[str, Position]:
-        service_positions = api.GetReservationServicesPositions(sandbox_id).ResourceDiagramLayouts
-        service_positions_dict = {service.ResourceName: Position(service.X, service.Y) for service in service_positions}
-        return service_positions_dict
-
     def does_connector_has_existing_vnic_req(self, app: ReservationAppResource, connectors: List[Connector]) -> bool:
         has_existing_vnic_req = False
         for connector in connectors:
@@ -1,21 +1,32 @@
-from time import sleep
+from typing import List
 
 from cloudshell.api.cloudshell_api import UpdateTopologyGlobalInputsRequest, ReservationShortInfo
 from cloudshell.api.common_cloudshell_api import CloudShellAPIError
 from cloudshell.workflow.orchestration.sandbox import Sandbox
 
+from cloudshell.orch.training.models.polling_policy import PollingPolicy
 from cloudshell.orch.training.services.sandbox_output import SandboxOutputService
+from cloudshell.orch.training.services.sandbox_readiness import SandboxReadinessPoller
 from cloudshell.orch.training.services.users_data_manager import UsersDataManagerService, \
     UsersDataManagerServiceKeys as userDataKeys
+from cloudshell.orch.training.utils.parallel import ParallelUtils
 
 
 class SandboxLifecycleService:
 
     def __init__(self, sandbox: Sandbox, sandbox_output: SandboxOutputService,
-                 users_data_manager: UsersDataManagerService):
+                 users_data_manager: UsersDataManagerService, polling_policy: PollingPolicy = None,
+                 max_concurrency: int = 1, print_power_off_output: bool = False):
+        """
+        :param max_concurrency: number of parallel commands when powering off or removing apps
+        :param print_power_off_output: print the output of every power off command to the sandbox output
+        """
         self._sandbox = sandbox
         self._sandbox_output = sandbox_output
         self._users_data_manager = users_data_manager
+        self._polling_policy = polling_policy or PollingPolicy()
+        self._max_concurrency = max_concurrency
+        self._print_power_off_output = print_power_off_output
         self._api = self._sandbox.automation_api
 
     def create_trainee_sandbox(self, blueprint_name: str, user: str, user_id: str,
@@ -37,31 +48,25 @@ class SandboxLifecycleService:
 
         return new_sandbox.Reservation
 
-    def wait_ready(self, sandbox_id: str, user: str, interval: int = 10):
-        time_waited = 0
-
-        user_sandbox_status = self._api.GetReservationStatus(sandbox_id)
-
-        while user_sandbox_status.ReservationSlimStatus.Status != "Started" or \
-                user_sandbox_status.ReservationSlimStatus.ProvisioningStatus != "Ready":
-
-            self._sandbox_output.notify(f"waiting for {user}'s sandbox, currently {sandbox_id}'s sandbox status is"
-                                        f" {user_sandbox_status.ReservationSlimStatus.Status} and {user_sandbox_status.ReservationSlimStatus.ProvisioningStatus}")
-            sleep(interval)
-            time_waited += interval
-            user_sandbox_status = self._api.GetReservationStatus(sandbox_id)
-
-            if user_sandbox_status.ReservationSlimStatus.ProvisioningStatus == 'Error':
-                raise Exception('Cannot create student sandbox')
-
-            if user_sandbox_status.ReservationSlimStatus.Status == 'Teardown':
-                raise Exception('Cannot create student sandbox')
-
-            if user_sandbox_status.ReservationSlimStatus.Status == 'Completed':
-                raise Exception('Cannot create student sandbox')
-
-    def clear_sandbox_components(self, sandbox: Sandbox) -> None:
+    def wait_ready(self, sandbox_id: str, user: str):
+        """
+        Wait for a single sandbox to be ready, raises if the sandbox failed or the polling deadline was exceeded
+        """
+        poller = SandboxReadinessPoller(self._sandbox, self._polling_policy)
+        readiness = next(poller.wait_for_sandboxes({user: sandbox_id}))
+
+        if readiness.timed_out:
+            raise Exception(f'Timed out waiting for student sandbox of {user}')
+        if not readiness.is_ready:
+            raise Exception('Cannot create student sandbox')
+
+    def clear_sandbox_components(self, sandbox: Sandbox) -> bool:
+        """
+        Remove all resources, services and apps from the sandbox
+        :return: True if no components were left in the sandbox
+        """
         api = sandbox.automation_api
+        emptied = True
         sandbox_details = api.GetReservationDetails(sandbox.id).ReservationDescription
 
         # delete all resources
@@ -79,10 +84,28 @@ class SandboxLifecycleService:
                 # service removal
                 sandbox.logger.exception('failed to delete services')
                 self._sandbox_output.notify(f'failed to delete services with error: {ex}')
+                emptied = False
 
         # delete all apps
-        for app in sandbox_details.Apps:
-            api.RemoveAppFromReservation(sandbox.id, appName=app.Name)
+        self._remove_apps(sandbox, [app.Name for app in sandbox_details.Apps])
+
+        return emptied
+
+    def _remove_apps(self, sandbox: Sandbox, app_names: List[str]):
+        """
+        Remove the apps concurrently, there is no API to remove many apps in a single call
+        """
+        if not app_names:
+            return
+
+        results = ParallelUtils.run_in_parallel(
+            lambda app_name: sandbox.automation_api.RemoveAppFromReservation(sandbox.id, appName=app_name),
+            app_names, self._max_concurrency)
+
+        failures = ParallelUtils.get_failures(results)
+        self._sandbox_output.debug_print(f"Removed {len(results) - len(failures)} apps, {len(failures)} failed, "
+                                         f"using {len(results)} calls")
+        ParallelUtils.raise_on_failures(results, "Removing apps", "apps")
 
     def end_student_reservation(self, user: str, instructor_mode: bool) -> None:
         user_reservation_id = self._users_data_manager.get_key(user, userDataKeys.SANDBOX_ID) \
@@ -96,19 +119,60 @@ class SandboxLifecycleService:
         if user_reservation_status == 'Completed':
             return
 
-        user_reservation_details = self._api.GetReservationDetails(user_reservation_id)
-        user_resources = user_reservation_details.ReservationDescription.Resources
-        apps_names_shared_with_student = [resource.Name for resource in user_resources if
-                                          resource.VmDetails and resource.CreatedInReservation != user_reservation_id]
-
         self._sandbox_output.notify(f"Cleaning up '{user}' resources")
 
+        removed = instructor_mode and self._try_remove_recorded_apps(user, user_reservation_id)
+        if not removed:
+            apps_names_shared_with_student = self._get_apps_shared_with_student(user_reservation_id)
+            self._remove_apps_shared_with_student(user, user_reservation_id, apps_names_shared_with_student,
+                                                  instructor_mode)
+
+        self._api.EndReservation(user_reservation_id)
+
+    def _try_remove_recorded_apps(self, user: str, user_reservation_id: str) -> bool:
+        """
+        Remove the resources that the instructor sandbox recorded at setup as added to the student sandbox
+        :return: False if there is no record or the record is out of date, then the resources must be read from the
+        student sandbox
+        """
+        added_resources = self._users_data_manager.get_key(user, userDataKeys.ADDED_RESOURCES)
+        if added_resources is None:
+            return False
+
+        try:
+            self._remove_apps_shared_with_student(user, user_reservation_id, added_resources, True)
+            return True
+        except Exception:
+            # a recorded resource might have been removed from the student sandbox or deleted since setup
+            self._sandbox.logger.exception(f"Removing the recorded resources of {user} failed, reading the resources "
+                                           f"of the student sandbox")
+            return False
+
+    def _remove_apps_shared_with_student(self, user: str, user_reservation_id: str, app_names: List[str],
+                                         instructor_mode: bool):
         # all apps that were deployed in the instructor sandbox will be removed from the student reservation
-        if apps_names_shared_with_student:
+        if app_names:
             self._sandbox_output.debug_print(f"Removing resources for {user}")
             if not instructor_mode:
-                for app_name in apps_names_shared_with_student:
-                    self._api.ExecuteCommand(user_reservation_id, app_name, "Resource", "Power Off", [], True)
-            self._api.RemoveResourcesFromReservation(user_reservation_id, apps_names_shared_with_student)
+                self._power_off_apps(user_reservation_id, app_names)
+            self._api.RemoveResourcesFromReservation(user_reservation_id, app_names)
 
-        self._api.EndReservation(user_reservation_id)
\ No newline at end of file
+    def _get_apps_shared_with_student(self, user_reservation_id: str) -> List[str]:
+        user_reservation_details = self._api.GetReservationDetails(user_reservation_id)
+        user_resources = user_reservation_details.ReservationDescription.Resources
+        return [resource.Name for resource in user_resources if
+                resource.VmDetails and resource.CreatedInReservation != user_reservation_id]
+
+    def _power_off_apps(self, reservation_id: str, app_names: List[str]):
+        """
+        Power off the apps concurrently, failures do not stop the other apps and are written as a single summary
+        """
+        results = ParallelUtils.run_in_parallel(
+            lambda app_name: self._api.ExecuteCommand(reservation_id, app_name, "Resource", "Power Off", [],
+                                                      self._print_power_off_output),
+            app_names, self._max_concurrency)
+
+        summary = ParallelUtils.get_failures_summary(results, "Power Off", "apps")
+        if summary:
+            self._sandbox.logger.error(summary)
+            self._sandbox_output.notify(f'<font style="color:red">{summary}</font>')
\ No newline at end of file
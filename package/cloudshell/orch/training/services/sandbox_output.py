@@ -1,17 +1,84 @@
+from threading import Lock, Thread
+from time import sleep
+
 from cloudshell.workflow.orchestration.sandbox import Sandbox
 
 
 class SandboxOutputService:
+    """
+    In buffered mode messages are collected and written to the sandbox output in combined writes when the flush
+    interval passes or the buffer is full. Callers must call flush() at the end of every stage.
+    This service is thread safe
+    """
 
-    def __init__(self, sandbox: Sandbox, debug_enabled: bool):
+    def __init__(self, sandbox: Sandbox, debug_enabled: bool, buffered: bool = False, flush_interval: float = 2,
+                 max_buffered_messages: int = 20):
         self._sandbox = sandbox
         self._debug_enabled = debug_enabled
+        self._buffered = buffered
+        self._flush_interval = flush_interval
+        self._max_buffered_messages = max_buffered_messages
+
+        # guards the buffer, held only for short in memory operations
+        self._lock = Lock()
+        # serializes the combined writes so they keep the order of the messages
+        self._write_lock = Lock()
+        self._buffer = []
+        self._flush_thread = None
 
     def notify(self, message: str):
         self._sandbox.logger.info(message)
-        self._sandbox.automation_api.WriteMessageToReservationOutput(self._sandbox.id, message)
+        self._write(message)
 
     def debug_print(self, message: str):
         self._sandbox.logger.debug(message)
         if self._debug_enabled:
+            self._write(message)
+
+    def flush(self):
+        """
+        Write the buffered messages. If the write fails the messages are kept in the buffer for the next flush
+        """
+        with self._write_lock:
+            with self._lock:
+                messages = self._buffer
+                self._buffer = []
+            if not messages:
+                return
+
+            try:
+                self._sandbox.automation_api.WriteMessageToReservationOutput(self._sandbox.id, '\n'.join(messages))
+            except Exception:
+                with self._lock:
+                    # messages buffered during the failed write come after the messages that were not written
+                    self._buffer = messages + self._buffer
+                raise
+
+    def _write(self, message: str):
+        if not self._buffered:
             self._sandbox.automation_api.WriteMessageToReservationOutput(self._sandbox.id, message)
+            return
+
+        with self._lock:
+            self._buffer.append(message)
+            buffer_full = len(self._buffer) >= self._max_buffered_messages
+            self._start_flush_thread()
+
+        # the write is done outside the buffer lock so other threads can keep buffering messages meanwhile
+        if buffer_full:
+            self.flush()
+
+    def _start_flush_thread(self):
+        if self._flush_thread:
+            return
+        self._flush_thread = Thread(target=self._flush_periodically, daemon=True)
+        self._flush_thread.start()
+
+    def _flush_periodically(self):
+        # daemon thread, lives as long as the orchestration script
+        while True:
+            sleep(self._flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                self._sandbox.logger.exception("Failed to write buffered messages to sandbox output")
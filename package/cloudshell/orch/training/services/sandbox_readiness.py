@@ -0,0 +1,82 @@
+from time import sleep, monotonic
+from typing import Callable, Dict, Iterator
+
+from cloudshell.workflow.orchestration.sandbox import Sandbox
+
+from cloudshell.orch.training.models.polling_policy import PollingPolicy
+
+FAILED_PROVISIONING_STATUSES = ['Error']
+FAILED_STATUSES = ['Teardown', 'Completed']
+
+
+class SandboxReadinessResult:
+    def __init__(self, user: str, sandbox_id: str, status: str, provisioning_status: str, timed_out: bool = False):
+        self.user = user
+        self.sandbox_id = sandbox_id
+        self.status = status
+        self.provisioning_status = provisioning_status
+        self.timed_out = timed_out
+
+    @property
+    def is_ready(self) -> bool:
+        return self.status == 'Started' and self.provisioning_status == 'Ready'
+
+    @property
+    def is_failed(self) -> bool:
+        return self.timed_out or self.provisioning_status in FAILED_PROVISIONING_STATUSES or \
+            self.status in FAILED_STATUSES
+
+
+class SandboxReadinessPoller:
+    """
+    Polls the status of many sandboxes in a single loop, so the total wait is bounded by the slowest sandbox.
+    The interval between polling rounds is taken from the polling policy. The status of every pending sandbox is
+    written to the log only, the sandbox output gets a progress summary from the caller through on_tick
+    """
+
+    def __init__(self, sandbox: Sandbox, polling_policy: PollingPolicy = None):
+        self._sandbox = sandbox
+        self._polling_policy = polling_policy or PollingPolicy()
+        self._api = self._sandbox.automation_api
+
+    def wait_for_sandboxes(self, user_sandboxes: Dict[str, str],
+                           on_tick: Callable[[], None] = None) -> Iterator[SandboxReadinessResult]:
+        """
+        :param user_sandboxes: user to sandbox id
+        :param on_tick: called after every polling round, used for progress reporting
+        :return: yields a result for every sandbox in the order the sandboxes become Ready or fail. Sandboxes that
+        are not ready when the polling deadline is exceeded are yielded as timed out
+        """
+        pending = dict(user_sandboxes)
+        start_time = monotonic()
+        attempt = 0
+
+        while pending:
+            for user, sandbox_id in list(pending.items()):
+                result = self._get_readiness(user, sandbox_id)
+                if result.is_ready or result.is_failed:
+                    del pending[user]
+                    yield result
+                else:
+                    self._sandbox.logger.debug(f"{user}'s sandbox {sandbox_id} status is {result.status} and "
+                                               f"{result.provisioning_status}")
+
+            if on_tick:
+                on_tick()
+
+            if not pending:
+                break
+
+            if self._polling_policy.is_deadline_exceeded(monotonic() - start_time):
+                for user, sandbox_id in pending.items():
+                    yield SandboxReadinessResult(user, sandbox_id, None, None, timed_out=True)
+                break
+
+            self._sandbox.logger.debug(f"Waiting for {len(pending)} out of {len(user_sandboxes)} "
+                                       f"trainee sandboxes to be ready")
+            sleep(self._polling_policy.get_interval(attempt))
+            attempt += 1
+
+    def _get_readiness(self, user: str, sandbox_id: str) -> SandboxReadinessResult:
+        slim_status = self._api.GetReservationStatus(sandbox_id).ReservationSlimStatus
+        return SandboxReadinessResult(user, sandbox_id, slim_status.Status, slim_status.ProvisioningStatus)
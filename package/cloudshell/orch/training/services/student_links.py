@@ -22,9 +22,8 @@ class StudentLinksProvider:
         return f"{self._training_portal_base_url}/{sandbox_id}?access={token}"
 
     def _create_token(self, user: str, domain: str) -> str:
-        admin_token = self._sandbox_api.login()
         try:
-            created_token = self._sandbox_api.create_token(admin_token, user, domain)
+            created_token = self._sandbox_api.create_token(user, domain)
         except CloudShellAPIError as exc:
             self._sandbox.logger.exception(f"Creating trainee token for {user} failed - exception occurred")
             raise
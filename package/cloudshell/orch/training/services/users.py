@@ -1,16 +1,21 @@
 import logging
-from typing import List
+from typing import List, Optional, Set
 
-from cloudshell.api.cloudshell_api import CloudShellAPISession
+from cloudshell.api.cloudshell_api import CloudShellAPISession, UserInfo
 from cloudshell.api.common_cloudshell_api import CloudShellAPIError
 
+from cloudshell.orch.training.utils.parallel import ParallelUtils, ParallelTaskResult
 from cloudshell.orch.training.utils.password import PasswordUtils
 
 
 class UsersService:
-    def __init__(self, api: CloudShellAPISession, logger: logging.Logger):
+    def __init__(self, api: CloudShellAPISession, logger: logging.Logger, max_concurrency: int = 1):
+        """
+        :param max_concurrency: number of parallel requests in batch operations
+        """
         self._api = api
         self._logger = logger
+        self._max_concurrency = max_concurrency
 
     def get_training_users_group_name(self, instructor_sandbox_id: str):
         return f'training-{instructor_sandbox_id}'
@@ -43,21 +48,69 @@ class UsersService:
         self._logger.debug(f'deactivating user {user}')
         self._api.UpdateUser(user, user, isActive=False)
 
+    def deactivate_training_users(self, instructor_sandbox_id: str, users: List[str]) -> List[ParallelTaskResult]:
+        """
+        Deactivate the users of the training in parallel. Users that are members of any group other than the training
+        users group of this training are skipped, like existing users of the organization or users of another live
+        training, and so are admins
+        :return: result per deactivated user
+        """
+        users_to_keep_active = self._get_users_to_keep_active(instructor_sandbox_id)
+        users_to_deactivate = [user for user in users if user.lower() not in users_to_keep_active]
+        skipped_users = [user for user in users if user.lower() in users_to_keep_active]
+        if skipped_users:
+            self._logger.debug(f'not deactivating users {skipped_users}, they are admins or members of other groups')
+
+        return ParallelUtils.run_in_parallel(self.deactivate_training_user, users_to_deactivate,
+                                             self._max_concurrency)
+
+    def _get_users_to_keep_active(self, instructor_sandbox_id: str) -> Set[str]:
+        # membership index of all groups built in a single call, user names are case insensitive
+        group_name = self.get_training_users_group_name(instructor_sandbox_id)
+        return {user.Name.lower() for group in self._api.GetGroupsDetails().Groups for user in group.Users
+                if group.Name != group_name or user.IsAdmin or user.IsDomainAdmin}
+
     def create_or_activate_training_user(self, user: str):
         self._logger.debug(f'Creating/Activating user {user}')
         try:
             system_user = self._api.GetUserDetails(user)
             self._logger.debug(f'user {user} exist')
             if not system_user.IsActive:
-                self._logger.debug(f'user {user} not active, activating user')
-                self._api.UpdateUser(user, user, isActive=True)
+                self._activate_training_user(user)
 
         except CloudShellAPIError as exc:
             if exc.code == '133':
-                #
-                self._logger.debug(f'user {user} doesnt exist, creating user')
-                new_user_pass = PasswordUtils.generate_random_password()
-                self._api.AddNewUser(user, new_user_pass, user, isActive=True)
+                self._create_training_user(user)
             else:
                 self._logger.exception('error updating training user')
                 raise
+
+    def create_or_activate_training_users(self, users: List[str]) -> List[ParallelTaskResult]:
+        """
+        Create the missing users and activate the inactive users in parallel. All existing users are fetched in a
+        single call and compared with the requested users, only the needed creates and activations are sent
+        :return: result per user
+        """
+        # user names are case insensitive in CloudShell
+        system_users = {system_user.Name.lower(): system_user for system_user in self._api.GetAllUsersDetails().Users}
+
+        return ParallelUtils.run_in_parallel(
+            lambda user: self._create_or_activate_fetched_user(user, system_users.get(user.lower())), users,
+            self._max_concurrency)
+
+    def _create_or_activate_fetched_user(self, user: str, system_user: Optional[UserInfo]):
+        if system_user is None:
+            self._create_training_user(user)
+        elif not system_user.IsActive:
+            self._activate_training_user(user)
+        else:
+            self._logger.debug(f'user {user} exist')
+
+    def _create_training_user(self, user: str):
+        self._logger.debug(f'user {user} doesnt exist, creating user')
+        new_user_pass = PasswordUtils.generate_random_password()
+        self._api.AddNewUser(user, new_user_pass, user, isActive=True)
+
+    def _activate_training_user(self, user: str):
+        self._logger.debug(f'user {user} not active, activating user')
+        self._api.UpdateUser(user, user, isActive=True)
@@ -2,7 +2,7 @@ import json
 from threading import Lock
 from typing import Dict
 
-from cloudshell.api.cloudshell_api import SandboxDataKeyValue
+from cloudshell.api.cloudshell_api import SandboxDataKeyValue, GetSandboxDataInfo
 from cloudshell.workflow.orchestration.sandbox import Sandbox
 
 USERS_DICT_KEY = "users_dict"
@@ -13,6 +13,8 @@ class UsersDataManagerServiceKeys:
     TOKEN = "token"
     STUDENT_LINK = "student_link"
     ID = "id"
+    # names of the instructor sandbox resources that were added to the student sandbox
+    ADDED_RESOURCES = "added_resources"
 
 
 class UsersDataManagerService:
@@ -40,12 +42,14 @@ class UsersDataManagerService:
         user_data = self._data.get(user)
         return None if not user_data else user_data.get(key)
 
-    def load(self):
+    def load(self, sandbox_data: GetSandboxDataInfo = None):
         """
         Method will override internal cache
+        :param sandbox_data: sandbox data that was already fetched, if None the sandbox data is fetched
         """
         with self._lock:
-            data_kvp = self._sandbox.automation_api.GetSandboxData(self._sandbox.id).SandboxDataKeyValues
+            sandbox_data = sandbox_data or self._sandbox.automation_api.GetSandboxData(self._sandbox.id)
+            data_kvp = sandbox_data.SandboxDataKeyValues
             if data_kvp:
                 users_data = next(iter(filter(lambda x: x.Key == USERS_DICT_KEY, data_kvp)), None)
                 self._data = json.loads(users_data.Value) if users_data else {}
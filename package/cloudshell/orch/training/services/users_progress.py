@@ -0,0 +1,66 @@
+from collections import Counter
+from threading import Lock
+from time import monotonic
+from typing import List
+
+from cloudshell.orch.training.services.sandbox_output import SandboxOutputService
+
+
+class UserProgressStates:
+    QUEUED = "queued"
+    CREATING = "creating"
+    PROVISIONING = "provisioning"
+    ADDING_RESOURCES = "adding resources"
+    SENDING_EMAIL = "sending email"
+    READY = "ready"
+    FAILED = "failed"
+
+
+# order of the states in the summary line
+STATES_SUMMARY_ORDER = [UserProgressStates.CREATING, UserProgressStates.PROVISIONING,
+                        UserProgressStates.ADDING_RESOURCES, UserProgressStates.SENDING_EMAIL,
+                        UserProgressStates.QUEUED, UserProgressStates.FAILED]
+
+
+class UsersProgressReporter:
+    """
+    Tracks the state of every user and writes a single summary line to the sandbox output at most once per interval,
+    instead of a line per user on every change.
+    This service is thread safe
+    """
+
+    def __init__(self, sandbox_output: SandboxOutputService, interval: float = 30):
+        self._sandbox_output = sandbox_output
+        self._interval = interval
+        self._lock = Lock()
+        self._states = {}
+        self._last_report_time = None
+
+    def track(self, users: List[str]):
+        with self._lock:
+            self._states = {user: UserProgressStates.QUEUED for user in users}
+            self._last_report_time = None
+
+    def set_state(self, user: str, state: str):
+        with self._lock:
+            self._states[user] = state
+        self.report()
+
+    def report(self, force: bool = False):
+        """
+        Write the progress summary if the interval passed since the last summary or if force is True
+        """
+        with self._lock:
+            now = monotonic()
+            if not force and self._last_report_time is not None and now - self._last_report_time < self._interval:
+                return
+            self._last_report_time = now
+            summary = self.get_summary()
+
+        self._sandbox_output.notify(summary)
+
+    def get_summary(self) -> str:
+        counts = Counter(self._states.values())
+        summary_parts = [f"{counts[UserProgressStates.READY]}/{len(self._states)} ready"]
+        summary_parts.extend(f"{counts[state]} {state}" for state in STATES_SUMMARY_ORDER if counts[state])
+        return f"Trainee sandboxes: {', '.join(summary_parts)}"
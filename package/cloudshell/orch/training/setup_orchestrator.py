@@ -1,3 +1,6 @@
+from typing import Callable, Optional
+
+from cloudshell.api.cloudshell_api import GetSandboxDataInfo
 from cloudshell.workflow.orchestration.sandbox import Sandbox
 from cloudshell.workflow.orchestration.setup.default_setup_orchestrator import DefaultSetupWorkflow
 
@@ -9,9 +12,12 @@ from cloudshell.orch.training.services.sandbox_components import SandboxComponen
 from cloudshell.email import EmailService
 from cloudshell.orch.training.services.ip_increment_strategy import RequestedIPsIncrementStrategy
 from cloudshell.orch.training.services.ips_handler import IPsHandlerService
+from cloudshell.orch.training.services.reservation_snapshot import ReservationSnapshotService
+from cloudshell.orch.training.services.resource_positions import ResourcePositionsUpdater
 from cloudshell.orch.training.services.sandbox_api import SandboxAPIService
 from cloudshell.orch.training.services.sandbox_lifecycle import SandboxLifecycleService
 from cloudshell.orch.training.services.sandbox_output import SandboxOutputService
+from cloudshell.orch.training.services.sandbox_readiness import SandboxReadinessPoller
 from cloudshell.orch.training.services.student_links import StudentLinksProvider
 from cloudshell.orch.training.services.users import UsersService
 from cloudshell.orch.training.services.users_data_manager import UsersDataManagerService
@@ -33,23 +39,34 @@ class TrainingSetupWorkflow(object):
 
         # init services
         self._users_data_manager = UsersDataManagerService(self.sandbox)
-        sandbox_output_service = SandboxOutputService(self.sandbox, self.env_data.debug_enabled)
-        sandbox_create_service = SandboxLifecycleService(self.sandbox, sandbox_output_service, self._users_data_manager)
-        sandbox_api_service = SandboxAPIService(self.sandbox, self.config.sandbox_api_port, sandbox_output_service)
+        self._sandbox_output = SandboxOutputService(self.sandbox, self.env_data.debug_enabled,
+                                                    self.config.buffered_output, self.config.output_flush_interval,
+                                                    self.config.output_max_buffered_messages)
+        sandbox_create_service = SandboxLifecycleService(self.sandbox, self._sandbox_output, self._users_data_manager,
+                                                         self.config.polling_policy, self.config.max_concurrency,
+                                                         self.config.print_power_off_output)
+        sandbox_api_service = SandboxAPIService(self.sandbox, self.config.sandbox_api_port, self._sandbox_output,
+                                                self.config.max_concurrency, self.config.sandbox_api_connect_timeout,
+                                                self.config.sandbox_api_read_timeout)
         email_service = EmailService(self.config.email_config, self.sandbox.logger)
         student_links_provider = StudentLinksProvider(self.config.training_portal_base_url, self.sandbox,
                                                       sandbox_api_service)
-        apps_service = SandboxComponentsHelperService(sandbox_output_service)
-        users_service = UsersService(self.sandbox.automation_api, self.sandbox.logger)
+        apps_service = SandboxComponentsHelperService(self._sandbox_output)
+        users_service = UsersService(self.sandbox.automation_api, self.sandbox.logger, self.config.max_concurrency)
         ips_increment_service = RequestedIPsIncrementStrategy(IPsHandlerService(), self.sandbox.logger)
+        readiness_poller = SandboxReadinessPoller(self.sandbox, self.config.polling_policy)
+        positions_updater = ResourcePositionsUpdater(self.sandbox, self.config.max_concurrency)
+        self._reservation_snapshot = ReservationSnapshotService(self.sandbox)
 
         # init logic
-        self.user_sandbox_logic = UserSandboxesLogic(self.env_data, sandbox_output_service, self._users_data_manager,
-                                                     sandbox_create_service, email_service, student_links_provider,
-                                                     apps_service)
+        self.user_sandbox_logic = UserSandboxesLogic(self.env_data, self.config, self._sandbox_output,
+                                                     self._users_data_manager, sandbox_create_service, email_service,
+                                                     student_links_provider, apps_service, readiness_poller,
+                                                     positions_updater, self._reservation_snapshot)
         self.init_logic = InitializeEnvironmentLogic(self.env_data, self.config, self._users_data_manager,
-                                                     sandbox_output_service, apps_service, sandbox_create_service,
-                                                     users_service, ips_increment_service)
+                                                     self._sandbox_output, apps_service, sandbox_create_service,
+                                                     users_service, ips_increment_service,
+                                                     self._reservation_snapshot)
 
     def initialize_and_register(self, enable_provisioning: bool = True, enable_connectivity: bool = True,
                                 enable_configuration: bool = True):
@@ -60,11 +77,27 @@ class TrainingSetupWorkflow(object):
         """
         Prepare the sandbox environment before sandbox execution
         """
-        # load sandbox data
-        self._users_data_manager.load()
+        try:
+            # load sandbox data
+            self._users_data_manager.load(self._prefetch_bootstrap_data())
+
+            # prepare environment before setup execution
+            self.init_logic.prepare_environment(self.sandbox)
+        finally:
+            self._sandbox_output.flush()
+
+    def _prefetch_bootstrap_data(self) -> Optional[GetSandboxDataInfo]:
+        """
+        Issue the independent reads needed before the per user work concurrently
+        :return: the sandbox data, or None if it was not prefetched
+        """
+        if not self.env_data.instructor_mode:
+            # the student sandbox only clears its components and does not need the reservation snapshot
+            return None
 
-        # prepare environment before setup execution
-        self.init_logic.prepare_environment(self.sandbox)
+        sandbox_data, = self._reservation_snapshot.prefetch(
+            self.config.max_concurrency, [lambda: self.sandbox.automation_api.GetSandboxData(self.sandbox.id)])
+        return sandbox_data
 
     def register(self, enable_provisioning: bool = True, enable_connectivity: bool = True,
                  enable_configuration: bool = True):
@@ -72,21 +105,46 @@ class TrainingSetupWorkflow(object):
 
         if enable_provisioning:
             self.sandbox.logger.debug("Default provisioning is added to sandbox orchestration")
-            self.sandbox.workflow.add_to_provisioning(self.default_setup_workflow.default_provisioning, None)
+            self.sandbox.workflow.add_to_provisioning(
+                self._get_default_stage("provisioning", self.default_setup_workflow.default_provisioning), None)
 
         if enable_connectivity:
             self.sandbox.logger.debug("Default connectivity is added to sandbox orchestration")
-            self.sandbox.workflow.add_to_connectivity(self.default_setup_workflow.default_connectivity, None)
+            self.sandbox.workflow.add_to_connectivity(
+                self._get_default_stage("connectivity", self.default_setup_workflow.default_connectivity), None)
 
         if enable_configuration:
             self.sandbox.logger.debug("Default configuration is added to sandbox orchestration")
-            self.sandbox.workflow.add_to_configuration(self.default_setup_workflow.default_configuration, None)
+            self.sandbox.workflow.add_to_configuration(
+                self._get_default_stage("configuration", self.default_setup_workflow.default_configuration), None)
 
         if self.env_data.instructor_mode:
             self.sandbox.logger.debug("Create user sandboxes logic is added to sandbox orchestration")
             self.sandbox.workflow.on_configuration_ended(self._do_on_configuration_ended, None)
 
+    def _get_default_stage(self, stage_name: str, default_stage: Callable) -> Callable:
+        """
+        In student mode the default stage is skipped if initialize emptied the sandbox, there is nothing to deploy.
+        The check is done when the stage runs since register can be called before initialize
+        """
+        if self.env_data.instructor_mode:
+            return default_stage
+
+        def run_default_stage(sandbox, components):
+            if self.init_logic.is_student_sandbox_emptied():
+                sandbox.logger.info(f"Skipping default {stage_name}, the student sandbox has no components")
+                return
+            default_stage(sandbox, components)
+
+        return run_default_stage
+
     def _do_on_configuration_ended(self, sandbox, components):
-        self.user_sandbox_logic.create_user_sandboxes(sandbox, components)
-        # persist to sandbox data the users data
-        self._users_data_manager.save()
+        try:
+            self.user_sandbox_logic.create_user_sandboxes(sandbox, components)
+        finally:
+            try:
+                # persist to sandbox data the users data, also of the users that succeeded when others failed, so
+                # teardown can end their sandboxes and revoke their tokens
+                self._users_data_manager.save()
+            finally:
+                self._sandbox_output.flush()
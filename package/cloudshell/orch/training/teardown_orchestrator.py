@@ -24,15 +24,21 @@ class TrainingTeardownWorkflow(object):
         sandbox.logger.info("Bootstrapping teardown workflow")
 
         env_data = SandboxInputsParser.parse_sandbox_inputs(sandbox)
-        sandbox_output_service = SandboxOutputService(sandbox, env_data.debug_enabled)
-        sandbox_api_service = SandboxAPIService(sandbox, self.config.sandbox_api_port, sandbox_output_service)
+        sandbox_output_service = SandboxOutputService(sandbox, env_data.debug_enabled, self.config.buffered_output,
+                                                      self.config.output_flush_interval,
+                                                      self.config.output_max_buffered_messages)
+        sandbox_api_service = SandboxAPIService(sandbox, self.config.sandbox_api_port, sandbox_output_service,
+                                                self.config.max_concurrency, self.config.sandbox_api_connect_timeout,
+                                                self.config.sandbox_api_read_timeout)
         self._users_data_manager = UsersDataManagerService(sandbox)
-        sandbox_lifecycle_service = SandboxLifecycleService(sandbox, sandbox_output_service, self._users_data_manager)
-        users_service = UsersService(sandbox.automation_api, sandbox.logger)
+        sandbox_lifecycle_service = SandboxLifecycleService(sandbox, sandbox_output_service, self._users_data_manager,
+                                                            self.config.polling_policy, self.config.max_concurrency,
+                                                            self.config.print_power_off_output)
+        users_service = UsersService(sandbox.automation_api, sandbox.logger, self.config.max_concurrency)
 
         self._sandbox_terminator = SandboxTerminateLogic(sandbox_output_service, sandbox_api_service,
                                                          sandbox_lifecycle_service, self._users_data_manager, env_data,
-                                                         users_service)
+                                                         users_service, self.config)
 
     def _initialize(self) -> None:
         self._users_data_manager.load()
@@ -0,0 +1,81 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List
+
+
+class ParallelTaskResult:
+    def __init__(self, item: Any, result: Any = None, error: Exception = None):
+        self.item = item
+        self.result = result
+        self.error = error
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
+class ParallelUtils:
+
+    @staticmethod
+    def run_in_parallel(func: Callable[[Any], Any], items: Iterable, max_workers: int) -> List[ParallelTaskResult]:
+        """
+        Run func for every item with at most max_workers concurrent threads. Exceptions raised by func are captured
+        per item so one failing item does not stop the others.
+        :return: a result for every item, in the same order as the items
+        """
+        items = list(items)
+
+        if max_workers <= 1 or len(items) <= 1:
+            return [_run_safely(func, item) for item in items]
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+            return list(executor.map(lambda item: _run_safely(func, item), items))
+
+    @staticmethod
+    def run_as_items_arrive(func: Callable[[Any], Any], items: Iterable, max_workers: int) \
+            -> List[ParallelTaskResult]:
+        """
+        Same as run_in_parallel, but every item is submitted as soon as the items iterable yields it. This lets a slow
+        producer (like a poller) overlap with the processing of the items it already produced.
+        :return: a result for every item, in the order the items were produced
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_run_safely, func, item) for item in items]
+        return [future.result() for future in futures]
+
+    @staticmethod
+    def get_failures(results: List[ParallelTaskResult]) -> List[ParallelTaskResult]:
+        return [result for result in results if not result.succeeded]
+
+    @staticmethod
+    def get_failures_summary(results: List[ParallelTaskResult], operation: str, items_name: str = "items",
+                             describe_item: Callable[[Any], str] = str) -> str:
+        """
+        :param operation: what was done for every item, the summary starts with it
+        :param items_name: plural name of the items, like users or apps
+        :param describe_item: returns the name of an item in the summary
+        :return: a summary of all failed items and the first error, empty if no item failed
+        """
+        failures = ParallelUtils.get_failures(results)
+        if not failures:
+            return ""
+
+        failed_items = ", ".join(describe_item(failure.item) for failure in failures)
+        return f"{operation} failed for {len(failures)} out of {len(results)} {items_name}: {failed_items}. " \
+               f"First error: {failures[0].error}"
+
+    @staticmethod
+    def raise_on_failures(results: List[ParallelTaskResult], operation: str, items_name: str = "items",
+                          describe_item: Callable[[Any], str] = str):
+        """
+        Raise a single exception with the summary of all failed items, see get_failures_summary
+        """
+        summary = ParallelUtils.get_failures_summary(results, operation, items_name, describe_item)
+        if summary:
+            raise Exception(summary)
+
+
+def _run_safely(func: Callable[[Any], Any], item: Any) -> ParallelTaskResult:
+    try:
+        return ParallelTaskResult(item, result=func(item))
+    except Exception as exc:
+        return ParallelTaskResult(item, error=exc)
@@ -0,0 +1,65 @@
+import unittest
+
+from mock import Mock
+
+from cloudshell.orch.training.models.connector_index import ConnectorIndex
+from cloudshell.orch.training.services.sandbox_components import SandboxComponentsHelperService
+
+
+class CountingConnectors:
+    """
+    Iterable over connectors that counts how many connectors were read
+    """
+
+    def __init__(self, connectors: list):
+        self._connectors = connectors
+        self.reads = 0
+
+    def __iter__(self):
+        for connector in self._connectors:
+            self.reads += 1
+            yield connector
+
+
+class TestConnectorIndex(unittest.TestCase):
+
+    def _connector(self, source: str, target: str) -> Mock:
+        return Mock(Source=source, Target=target)
+
+    def test_service_connectors(self):
+        # arrange
+        app_to_mgmt = self._connector("app1", "mgmt")
+        subnet_to_app = self._connector("subnet", "app1")
+        app_to_resource = self._connector("app1", "resource1")
+        other_app_to_subnet = self._connector("app2", "subnet")
+
+        # act
+        index = ConnectorIndex([app_to_mgmt, subnet_to_app, app_to_resource, other_app_to_subnet],
+                               ["mgmt", "subnet"])
+
+        # assert
+        self.assertEqual(index.get_service_connectors("app1"), [app_to_mgmt, subnet_to_app])
+        self.assertEqual(index.get_service_connectors("app2"), [other_app_to_subnet])
+        self.assertEqual(index.get_service_connectors("resource1"), [])
+        self.assertEqual(index.get_service_connectors("unknown"), [])
+
+    def test_get_apps_to_connectors_dict_reads_connectors_once(self):
+        # arrange
+        services_count = 10
+        for apps_count in [10, 100, 1000]:
+            apps = [Mock() for _ in range(apps_count)]
+            for app_index, app in enumerate(apps):
+                app.Name = f"app{app_index}"
+            connectors = CountingConnectors(
+                [self._connector(app.Name, f"service{service_index}")
+                 for app in apps for service_index in range(services_count)])
+            sandbox_details = Mock(Connectors=connectors)
+            services_dict = {f"service{service_index}": Mock() for service_index in range(services_count)}
+
+            # act
+            result = SandboxComponentsHelperService(Mock()).get_apps_to_connectors_dict(apps, sandbox_details,
+                                                                                        services_dict)
+
+            # assert - every connector is read once, so the work grows linearly with the number of connectors
+            self.assertEqual(connectors.reads, apps_count * services_count)
+            self.assertTrue(all(len(app_connectors) == services_count for app_connectors in result.values()))
@@ -5,26 +5,35 @@ from freezegun import freeze_time
 from mock import MagicMock, call, ANY
 
 from cloudshell.orch.training.logic.create_user_sandboxes import UserSandboxesLogic
+from cloudshell.orch.training.models.config import TrainingWorkflowConfig
 from cloudshell.orch.training.models.position import Position
 from cloudshell.orch.training.models.student_link import StudentLinkModel
+from cloudshell.orch.training.services.reservation_snapshot import ReservationSnapshotService
+from cloudshell.orch.training.services.resource_positions import ResourcePositionsUpdater
+from cloudshell.orch.training.services.sandbox_readiness import SandboxReadinessResult
 from cloudshell.orch.training.services.users_data_manager import UsersDataManagerServiceKeys as userDataKeys
+from cloudshell.orch.training.utils.parallel import ParallelTaskResult
 
 
 class TestUserSandboxesLogic(unittest.TestCase):
 
     def setUp(self):
         self.env_data = Mock()
+        self.config = TrainingWorkflowConfig(max_concurrency=4)
         self.sandbox_output_service = Mock()
         self.users_data_manager = Mock()
         self.sandbox_create_service = Mock()
         self.email_service = Mock()
         self.student_links_provider = Mock()
         self.apps_service = Mock()
-        self.logic = UserSandboxesLogic(self.env_data, self.sandbox_output_service, self.users_data_manager,
-                                        self.sandbox_create_service, self.email_service, self.student_links_provider,
-                                        self.apps_service)
-
+        self.readiness_poller = Mock()
         self.sandbox = Mock()
+        self.positions_updater = ResourcePositionsUpdater(self.sandbox, self.config.max_concurrency)
+        self.reservation_snapshot = ReservationSnapshotService(self.sandbox)
+        self.logic = UserSandboxesLogic(self.env_data, self.config, self.sandbox_output_service,
+                                        self.users_data_manager, self.sandbox_create_service, self.email_service,
+                                        self.student_links_provider, self.apps_service, self.readiness_poller,
+                                        self.positions_updater, self.reservation_snapshot)
 
     def test_create_no_user_list(self):
         # arrange
@@ -37,12 +46,17 @@ class TestUserSandboxesLogic(unittest.TestCase):
         # assert
         self.logic._get_latest_sandbox_details.assert_not_called()
 
-    def test_create_user_sandboxes(self):
+    def test_create_user_sandboxes_stages(self):
         # arrange
         sandbox_details_mock = Mock()
+        shared_resources = Mock()
+        self.env_data.users_list = ['user1', 'user2']
         self.logic._get_latest_sandbox_details = Mock(return_value=sandbox_details_mock)
+        self.logic._get_shared_resources = Mock(return_value=shared_resources)
         self.logic._create_user_sandboxes = Mock()
-        self.logic._wait_for_active_sandboxes_and_add_duplicated_resources = Mock()
+        self.logic._share_resources_for_users = Mock()
+        self.logic._wait_for_active_sandboxes_and_add_duplicated_resources = Mock(
+            return_value=[ParallelTaskResult('user2'), ParallelTaskResult('user1')])
         self.logic._send_emails = Mock()
 
         # act
@@ -51,9 +65,119 @@ class TestUserSandboxesLogic(unittest.TestCase):
         # assert
         self.logic._get_latest_sandbox_details.assert_called_once_with(self.sandbox)
         self.logic._create_user_sandboxes.assert_called_once_with(self.sandbox, sandbox_details_mock)
-        self.logic._wait_for_active_sandboxes_and_add_duplicated_resources.assert_called_once_with(self.sandbox,
-                                                                                                   sandbox_details_mock)
-        self.logic._send_emails.assert_called_once()
+        self.logic._share_resources_for_users.assert_called_once_with(self.sandbox, sandbox_details_mock,
+                                                                      shared_resources)
+        self.logic._wait_for_active_sandboxes_and_add_duplicated_resources.assert_called_once_with(
+            self.sandbox, sandbox_details_mock, shared_resources)
+        self.logic._send_emails.assert_called_once_with(['user2', 'user1'])
+        self.sandbox_output_service.notify.assert_called_with("Trainee sandboxes: 0/2 ready, 2 queued")
+
+    def test_create_user_sandboxes_stages_failed_sandbox_does_not_block_emails(self):
+        # arrange
+        self.env_data.users_list = ['user1', 'user2']
+        self.logic._get_latest_sandbox_details = Mock()
+        self.logic._get_shared_resources = Mock(return_value=[])
+        self.logic._create_user_sandboxes = Mock()
+        self.logic._share_resources_for_users = Mock()
+        self.logic._wait_for_active_sandboxes_and_add_duplicated_resources = Mock(
+            return_value=[ParallelTaskResult('user1', error=Exception('sandbox is in Error')),
+                          ParallelTaskResult('user2')])
+        self.users_data_manager.get_key = Mock(return_value='user2_link')
+
+        # act
+        with self.assertRaises(Exception) as context:
+            self.logic.create_user_sandboxes(self.sandbox, Mock())
+
+        # assert
+        self.email_service.send_email.assert_called_once_with(['user2'], ANY,
+                                                              template_parameters={'sandbox_link': 'user2_link'})
+        self.assertIn('1 out of 2 users: user1', str(context.exception))
+
+    def test_create_user_sandboxes_pipelined(self):
+        # arrange
+        sandbox_details_mock = Mock()
+        self.config.pipelined_user_sandboxes = True
+        self.env_data.users_list = ['user1', 'user2']
+        self.logic._get_latest_sandbox_details = Mock(return_value=sandbox_details_mock)
+        self.logic._get_shared_resources = Mock(return_value=['shared_r1'])
+        self.logic._create_user_sandboxes = Mock()
+        self.logic._share_resources_for_users = Mock()
+        self.logic._prepare_user_sandboxes_as_ready = Mock()
+        self.logic._wait_for_active_sandboxes_and_add_duplicated_resources = Mock()
+        self.logic._send_emails = Mock()
+
+        # act
+        self.logic.create_user_sandboxes(self.sandbox, Mock())
+
+        # assert
+        self.logic._prepare_user_sandboxes_as_ready.assert_called_once_with(self.sandbox, sandbox_details_mock,
+                                                                            ['shared_r1'])
+        self.logic._wait_for_active_sandboxes_and_add_duplicated_resources.assert_not_called()
+        self.logic._send_emails.assert_not_called()
+
+    def test_create_user_sandboxes_stages_positions_failure_reported_with_users_failures(self):
+        # arrange
+        self.env_data.users_list = ['user1', 'user2']
+        self.logic._get_latest_sandbox_details = Mock()
+        self.logic._get_shared_resources = Mock(return_value=[])
+        self.logic._create_user_sandboxes = Mock()
+        self.logic._share_resources_for_users = Mock()
+        self.logic._wait_for_active_sandboxes_and_add_duplicated_resources = Mock(
+            return_value=[ParallelTaskResult('user1', error=Exception('sandbox is in Error')),
+                          ParallelTaskResult('user2')])
+        self.positions_updater.add('user2_sandbox_id', 'user2_r1', Position(10, 10))
+        self.sandbox.automation_api.SetReservationResourcePosition = Mock(side_effect=Exception('xml-rpc error'))
+
+        # act
+        with self.assertRaises(Exception) as context:
+            self.logic.create_user_sandboxes(self.sandbox, Mock())
+
+        # assert
+        self.assertIn('1 out of 2 users: user1', str(context.exception))
+        self.assertIn('Setting the positions of the trainee resources failed', str(context.exception))
+        self.email_service.send_email.assert_called_once_with(['user2'], ANY, template_parameters=ANY)
+
+    def test_prepare_user_sandboxes_as_ready(self):
+        # arrange
+        self.env_data.users_list = ['user1', 'user2']
+        self.users_data_manager.get_key = Mock(side_effect=lambda user, key: f'{user}_{key}')
+        self.readiness_poller.wait_for_sandboxes = Mock(return_value=iter([
+            SandboxReadinessResult('user2', 'user2_sandbox_id', 'Started', 'Ready'),
+            SandboxReadinessResult('user1', 'user1_sandbox_id', 'Started', 'Ready')]))
+        self.logic._get_resource_positions = Mock(return_value=MagicMock())
+        self.logic._get_user_resources = Mock(side_effect=lambda details, user: [f'{user}_r1'])
+
+        # act
+        self.logic._prepare_user_sandboxes_as_ready(self.sandbox, Mock(), ['shared_r1'])
+
+        # assert
+        self.sandbox.automation_api.AddResourcesToReservation.assert_has_calls(
+            [call('user1_sandbox_id', ['user1_r1', 'shared_r1'], shared=True),
+             call('user2_sandbox_id', ['user2_r1', 'shared_r1'], shared=True)], any_order=True)
+        self.sandbox.automation_api.SetReservationResourcePosition.assert_has_calls(
+            [call('user1_sandbox_id', 'user1_r1', ANY, ANY),
+             call('user2_sandbox_id', 'user2_r1', ANY, ANY)], any_order=True)
+        self.email_service.send_email.assert_has_calls(
+            [call(['user1'], ANY, template_parameters={'sandbox_link': f'user1_{userDataKeys.STUDENT_LINK}'}),
+             call(['user2'], ANY, template_parameters={'sandbox_link': f'user2_{userDataKeys.STUDENT_LINK}'})],
+            any_order=True)
+
+    def test_prepare_user_sandboxes_as_ready_failed_sandbox_gets_no_email(self):
+        # arrange
+        self.env_data.users_list = ['user1', 'user2']
+        self.readiness_poller.wait_for_sandboxes = Mock(return_value=iter([
+            SandboxReadinessResult('user1', 'user1_sandbox_id', 'Started', 'Error'),
+            SandboxReadinessResult('user2', 'user2_sandbox_id', 'Started', 'Ready')]))
+        self.logic._get_resource_positions = Mock(return_value=MagicMock())
+        self.logic._get_user_resources = Mock(return_value=[])
+
+        # act
+        with self.assertRaises(Exception) as context:
+            self.logic._prepare_user_sandboxes_as_ready(self.sandbox, Mock(), [])
+
+        # assert
+        self.email_service.send_email.assert_called_once_with(['user2'], ANY, template_parameters=ANY)
+        self.assertIn('1 out of 2 users: user1', str(context.exception))
 
     def test_wait_for_active_sandboxes_and_add_duplicated_resources(self):
         def get_key_side_effect(*args, **kwargs):
@@ -63,24 +187,29 @@ class TestUserSandboxesLogic(unittest.TestCase):
         sandbox_details = Mock()
         self.env_data.users_list = ['user1', 'user2']
         self.users_data_manager.get_key = Mock(side_effect=get_key_side_effect)
+        # user2's sandbox becomes ready first
+        self.readiness_poller.wait_for_sandboxes = Mock(return_value=iter([
+            SandboxReadinessResult('user2', 'user2_sandbox_id', 'Started', 'Ready'),
+            SandboxReadinessResult('user1', 'user1_sandbox_id', 'Started', 'Ready')]))
 
         self.logic._get_resource_positions = Mock(return_value=MagicMock())
-        self.logic._get_shared_resources = Mock(return_value=['shared_r1'])
-        self.logic._get_user_resources = Mock(side_effect=[['user1_r1', 'user1_r2'], ['user2_r1', 'user2_r2']])
+        self.logic._get_user_resources = Mock(side_effect=[['user2_r1', 'user2_r2'], ['user1_r1', 'user1_r2']])
 
         # act
-        self.logic._wait_for_active_sandboxes_and_add_duplicated_resources(self.sandbox, sandbox_details)
+        self.logic._wait_for_active_sandboxes_and_add_duplicated_resources(self.sandbox, sandbox_details,
+                                                                           ['shared_r1'])
+        # the positions are accumulated and set only when the updater is flushed
+        self.sandbox.automation_api.SetReservationResourcePosition.assert_not_called()
+        self.positions_updater.flush()
 
         # assert
-        self.sandbox_create_service.wait_ready.assert_has_calls([call('user1_sandbox_id', 'user1'),
-                                                                 call('user2_sandbox_id', 'user2')])
-        self.sandbox.automation_api.SetResourceSharedState.assert_has_calls(
-            [call(self.sandbox.id, ['user1_r1', 'user1_r2', 'shared_r1'], isShared=True),
-             call(self.sandbox.id, ['user2_r1', 'user2_r2', 'shared_r1'], isShared=True)]
-        )
+        self.readiness_poller.wait_for_sandboxes.assert_called_once_with({'user1': 'user1_sandbox_id',
+                                                                          'user2': 'user2_sandbox_id'},
+                                                                         on_tick=ANY)
+        self.sandbox.automation_api.SetResourceSharedState.assert_not_called()
         self.sandbox.automation_api.AddResourcesToReservation.assert_has_calls(
-            [call('user1_sandbox_id', ['user1_r1', 'user1_r2', 'shared_r1'], shared=True),
-             call('user2_sandbox_id', ['user2_r1', 'user2_r2', 'shared_r1'], shared=True)]
+            [call('user2_sandbox_id', ['user2_r1', 'user2_r2', 'shared_r1'], shared=True),
+             call('user1_sandbox_id', ['user1_r1', 'user1_r2', 'shared_r1'], shared=True)]
         )
         self.assertEqual(self.sandbox.automation_api.SetReservationResourcePosition.call_count, 4)
         self.sandbox.automation_api.SetReservationResourcePosition.assert_has_calls([
@@ -90,6 +219,49 @@ class TestUserSandboxesLogic(unittest.TestCase):
             call('user2_sandbox_id', 'user2_r2', ANY, ANY)
         ], any_order=True)
 
+    def test_wait_for_active_sandboxes_failed_sandbox_does_not_block_others(self):
+        # arrange
+        self.env_data.users_list = ['user1', 'user2']
+        self.readiness_poller.wait_for_sandboxes = Mock(return_value=iter([
+            SandboxReadinessResult('user1', 'user1_sandbox_id', 'Started', 'Error'),
+            SandboxReadinessResult('user2', 'user2_sandbox_id', 'Started', 'Ready')]))
+        self.logic._get_resource_positions = Mock(return_value=MagicMock())
+        self.logic._get_user_resources = Mock(return_value=['user2_r1'])
+
+        # act
+        results = self.logic._wait_for_active_sandboxes_and_add_duplicated_resources(self.sandbox, Mock(), [])
+
+        # assert
+        self.sandbox.automation_api.AddResourcesToReservation.assert_called_once_with('user2_sandbox_id',
+                                                                                      ['user2_r1'], shared=True)
+        self.users_data_manager.add_or_update.assert_called_once_with('user2', userDataKeys.ADDED_RESOURCES,
+                                                                      ['user2_r1'])
+        self.assertEqual(['user1'], [result.item for result in results if not result.succeeded])
+        self.assertEqual(['user2'], [result.item for result in results if result.succeeded])
+
+    def test_share_resources_for_users(self):
+        # arrange
+        self.env_data.users_list = ['user1', 'user2']
+        self.logic._get_user_resources = Mock(side_effect=[['user1_r1', 'user1_r2'], ['user2_r1', 'shared_r1']])
+
+        # act
+        self.logic._share_resources_for_users(self.sandbox, Mock(), ['shared_r1', 'shared_r2'])
+
+        # assert
+        self.sandbox.automation_api.SetResourceSharedState.assert_called_once_with(
+            self.sandbox.id, ['user1_r1', 'user1_r2', 'user2_r1', 'shared_r1', 'shared_r2'], isShared=True)
+
+    def test_share_resources_for_users_nothing_to_share(self):
+        # arrange
+        self.env_data.users_list = ['user1']
+        self.logic._get_user_resources = Mock(return_value=[])
+
+        # act
+        self.logic._share_resources_for_users(self.sandbox, Mock(), [])
+
+        # assert
+        self.sandbox.automation_api.SetResourceSharedState.assert_not_called()
+
     def test_get_resource_positions(self):
         # arrange
         resource_positions = [Mock(ResourceName='r1', X=10, Y=10), Mock(ResourceName='r2', X=20, Y=20)]
@@ -97,7 +269,7 @@ class TestUserSandboxesLogic(unittest.TestCase):
             Mock(return_value=Mock(ResourceDiagramLayouts=resource_positions))
 
         # act
-        result = self.logic._get_resource_positions(self.sandbox)
+        result = self.logic._get_resource_positions()
 
         # assert
         self.assertEqual(result, {'r1': Position(10, 10), 'r2': Position(20, 20)})
@@ -183,6 +355,26 @@ class TestUserSandboxesLogic(unittest.TestCase):
             call(self.sandbox.reservationContextDetails.environment_path, 'user2', ANY, duration)
         ])
 
+    def test_create_user_sandboxes_collects_failures(self):
+        def create_trainee_sandbox(blueprint, user, user_id, duration):
+            if user in ['user2', 'user3']:
+                raise Exception(f'failed for {user}')
+            return Mock(Id=f'{user}_sandbox_id')
+
+        # arrange
+        self.logic._calculate_user_sandbox_duration = Mock(return_value=Mock())
+        self.env_data.users_list = ['user1', 'user2', 'user3', 'user4']
+        self.sandbox_create_service.create_trainee_sandbox = Mock(side_effect=create_trainee_sandbox)
+
+        # act
+        with self.assertRaises(Exception) as context:
+            self.logic._create_user_sandboxes(self.sandbox, Mock())
+
+        # assert - all users were processed and both failures were reported together
+        self.assertEqual(self.sandbox_create_service.create_trainee_sandbox.call_count, 4)
+        self.assertEqual(self.student_links_provider.create_student_link.call_count, 2)
+        self.assertIn('2 out of 4 users: user2, user3', str(context.exception))
+
     def test_send_emails(self):
         # arrange
         self.env_data.users_list = ['user1', 'user2']
@@ -191,7 +383,7 @@ class TestUserSandboxesLogic(unittest.TestCase):
         self.users_data_manager.get_key = Mock(side_effect=[user1_link, user2_link])
 
         # act
-        self.logic._send_emails()
+        self.logic._send_emails(['user1', 'user2'])
 
         # assert
         self.email_service.send_email.assert_has_calls([call(['user1'], 'Welcome to Training', template_parameters={'sandbox_link': user1_link}),
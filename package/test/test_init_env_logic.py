@@ -4,26 +4,30 @@ from typing import List, Dict
 
 from cloudshell.api.cloudshell_api import ReservationAppResource, AttributeNameValue, Connector, CloudShellAPISession, \
     DeploymentPathInfo, ReservationDescriptionInfo
-from mock import Mock, call, MagicMock
+from mock import Mock, call, MagicMock, ANY
 
-from cloudshell.orch.training.logic.initialize_env import InitializeEnvironmentLogic
+from cloudshell.orch.training.logic.initialize_env import InitializeEnvironmentLogic, ConnectorsAttrUpdateRequest
+from cloudshell.orch.training.models.app_duplication_plan import AppDuplicationPlan
 from cloudshell.orch.training.models.position import Position
+from cloudshell.orch.training.utils.parallel import ParallelTaskResult
 
 
 class TestInitializeEnvironmentLogic(unittest.TestCase):
     def setUp(self) -> None:
         self.env_data = Mock()
-        self.config = Mock()
+        self.config = Mock(max_concurrency=4)
         users_data_manager = Mock()
         sandbox_output_service = Mock()
         self.components_service = Mock()
         self.sandbox_service = Mock()
         self.users_service = Mock()
         ips_increment_provider = Mock()
+        self.reservation_snapshot = Mock()
+        self.components_service.get_apps_to_duplicate = Mock(side_effect=lambda apps: apps)
         self.init_env_logic = InitializeEnvironmentLogic(self.env_data, self.config, users_data_manager,
                                                          sandbox_output_service, self.components_service,
                                                          self.sandbox_service, self.users_service,
-                                                         ips_increment_provider)
+                                                         ips_increment_provider, self.reservation_snapshot)
 
     def test_prepare_environment_student(self):
         # arrange
@@ -35,6 +39,19 @@ class TestInitializeEnvironmentLogic(unittest.TestCase):
         # assert
         self.sandbox_service.clear_sandbox_components.assert_called_once()
 
+    def test_is_student_sandbox_emptied(self):
+        # arrange
+        self.env_data.instructor_mode = False
+        self.sandbox_service.clear_sandbox_components = Mock(return_value=True)
+
+        # act
+        emptied_before = self.init_env_logic.is_student_sandbox_emptied()
+        self.init_env_logic.prepare_environment(Mock())
+
+        # assert
+        self.assertFalse(emptied_before)
+        self.assertTrue(self.init_env_logic.is_student_sandbox_emptied())
+
     def test_prepare_environment_instructor(self):
         # arrange
         self.env_data.instructor_mode = True
@@ -54,6 +71,8 @@ class TestInitializeEnvironmentLogic(unittest.TestCase):
         user1 = Mock()
         user2 = Mock()
         self.env_data.users_list = [user1, user2]
+        self.users_service.create_or_activate_training_users.return_value = [ParallelTaskResult(user1),
+                                                                             ParallelTaskResult(user2)]
 
         # act
         self.init_env_logic._create_or_activate_users(sandbox)
@@ -61,17 +80,31 @@ class TestInitializeEnvironmentLogic(unittest.TestCase):
         # assert
         self.users_service.create_training_users_group.assert_called_once_with(sandbox.id,
                                                                                sandbox.reservationContextDetails.domain)
-        self.users_service.create_or_activate_training_user.assert_has_calls([call(user1), call(user2)])
+        self.users_service.create_or_activate_training_users.assert_called_once_with([user1, user2])
         self.users_service.add_training_users_to_group.assert_called_once_with(sandbox.id, self.env_data.users_list)
 
+    def test_create_or_activate_users_failures(self):
+        # arrange
+        sandbox = Mock()
+        self.env_data.users_list = ['user1', 'user2']
+        self.users_service.create_or_activate_training_users.return_value = [
+            ParallelTaskResult('user1'), ParallelTaskResult('user2', error=Exception('add failed'))]
+
+        # act
+        with self.assertRaisesRegex(Exception, 'failed for 1 out of 2 users: user2'):
+            self.init_env_logic._create_or_activate_users(sandbox)
+
+        # assert
+        self.users_service.add_training_users_to_group.assert_not_called()
+
     def test_duplicate_students_apps(self):
         # arrange
         sandbox = Mock()
         sandbox.components.apps.values.return_value = MagicMock()
         self.components_service.get_apps_to_connectors_dict = Mock()
-        update_req_1 = Mock()
+        update_req_1 = ConnectorsAttrUpdateRequest("app1", "mgmt", [AttributeNameValue("vnic", "0")])
         self.init_env_logic._prepare_requested_vnic_attr_connector_changes = Mock(return_value=[update_req_1])
-        update_req_2 = Mock()
+        update_req_2 = ConnectorsAttrUpdateRequest("1_app1", "mgmt", [AttributeNameValue("vnic", "0")])
         self.init_env_logic._duplicate_apps = Mock(return_value=[update_req_2])
 
         # act
@@ -81,7 +114,40 @@ class TestInitializeEnvironmentLogic(unittest.TestCase):
         sandbox.automation_api.SetConnectorAttributes.assert_has_calls([
             call(sandbox.id, update_req_1.Source, update_req_1.Target, update_req_1.AttributeRequests),
             call(sandbox.id, update_req_2.Source, update_req_2.Target, update_req_2.AttributeRequests)
-        ])
+        ], any_order=True)
+
+    def test_merge_connectors_attr_updates(self):
+        # arrange
+        vnic_attr = AttributeNameValue("Requested Source vNIC Name", "0")
+        other_attr = AttributeNameValue("other", "value")
+        new_vnic_attr = AttributeNameValue("Requested Source vNIC Name", "1")
+        updates = [ConnectorsAttrUpdateRequest("app1", "mgmt", [vnic_attr]),
+                   ConnectorsAttrUpdateRequest("app2", "mgmt", [other_attr]),
+                   ConnectorsAttrUpdateRequest("app1", "mgmt", [other_attr, new_vnic_attr])]
+
+        # act
+        result = self.init_env_logic._merge_connectors_attr_updates(updates)
+
+        # assert
+        self.assertEqual(result, [ConnectorsAttrUpdateRequest("app1", "mgmt", [new_vnic_attr, other_attr]),
+                                  ConnectorsAttrUpdateRequest("app2", "mgmt", [other_attr])])
+
+    def test_set_connectors_attributes_collects_failures(self):
+        # arrange
+        api = Mock()
+        api.SetConnectorAttributes = Mock(side_effect=lambda sandbox_id, source, target, attributes:
+                                          self._raise(Exception("error")) if source == "app2" else None)
+        updates = [ConnectorsAttrUpdateRequest("app1", "mgmt", [AttributeNameValue("a", "1")]),
+                   ConnectorsAttrUpdateRequest("app2", "mgmt", [AttributeNameValue("a", "1")]),
+                   ConnectorsAttrUpdateRequest("app3", "mgmt", [AttributeNameValue("a", "1")])]
+
+        # act & assert
+        with self.assertRaisesRegex(Exception, "1 out of 3 connectors: app2->mgmt"):
+            self.init_env_logic._set_connectors_attributes(api, "sandbox_id", updates)
+        self.assertEqual(api.SetConnectorAttributes.call_count, 3)
+
+    def _raise(self, exc: Exception):
+        raise exc
 
     def test_calculate_duplicate_app_position(self):
         # arrange
@@ -139,11 +205,12 @@ class TestInitializeEnvironmentLogic(unittest.TestCase):
         mock_apps: List[ReservationAppResource] = [mock_app]
         mock_app_connectors: Dict[str, List[Connector]] = MagicMock()
         mock_sandbox_id: str = Mock()
-        self.init_env_logic._components_service.get_apps_to_duplicate = Mock(return_value=mock_apps)
+        mock_plan = AppDuplicationPlan(mock_app, Mock())
+        self.init_env_logic._create_duplication_plan = Mock(return_value=mock_plan)
         service_app_positions_dict = MagicMock()
         mock_service_app_positions = Mock()
         service_app_positions_dict.__getitem__ = MagicMock(return_value=mock_service_app_positions)
-        self.init_env_logic._components_service.get_service_and_app_name_to_position_dict = MagicMock(
+        self.reservation_snapshot.get_service_positions = MagicMock(
             return_value=service_app_positions_dict)
         self.init_env_logic._env_data.users_list = [Mock()]
         self.init_env_logic._duplicate_app_and_get_update_request = Mock()
@@ -152,10 +219,61 @@ class TestInitializeEnvironmentLogic(unittest.TestCase):
         self.init_env_logic._duplicate_apps(mock_api, mock_apps, mock_app_connectors, mock_sandbox_id)
 
         # assert
+        self.init_env_logic._create_duplication_plan.assert_called_once_with(mock_app)
         self.init_env_logic._duplicate_app_and_get_update_request.assert_called_once_with(mock_api, "1_mock_app_name",
-                                                                                          mock_app, mock_sandbox_id,
+                                                                                          mock_plan, mock_sandbox_id,
                                                                                           mock_service_app_positions, 0)
 
+    def test_duplicate_apps_concurrently_keeps_names_and_order(self):
+        # arrange
+        mock_api: CloudShellAPISession = Mock()
+        app1 = Mock()
+        app1.Name = "app1"
+        app2 = Mock()
+        app2.Name = "app2"
+        self.init_env_logic._create_duplication_plan = Mock(
+            side_effect=lambda app: AppDuplicationPlan(app, Mock()))
+        self.reservation_snapshot.get_service_positions = Mock(
+            return_value={"app1": Position(0, 0), "app2": Position(100, 0)})
+        self.init_env_logic._env_data.users_list = ["user1", "user2", "user3"]
+        self.init_env_logic._create_duplicate_app_connectors_requests = Mock(return_value=([], []))
+        self.init_env_logic._duplicate_app_and_get_update_request = Mock(
+            side_effect=lambda api, new_app_name, plan, sandbox_id, app_pos, user_index: new_app_name)
+
+        # act
+        self.init_env_logic._duplicate_apps(mock_api, [app1, app2], {"app1": [], "app2": []}, "sandbox_id")
+
+        # assert
+        self.assertEqual(self.init_env_logic._duplicate_app_and_get_update_request.call_count, 6)
+        mock_api.EditAppsInReservation.assert_called_once_with(
+            "sandbox_id", ["1_app1", "1_app2", "2_app1", "2_app2", "3_app1", "3_app2"])
+        self.init_env_logic._duplicate_app_and_get_update_request.assert_any_call(
+            mock_api, "3_app2", ANY, "sandbox_id", Position(100, 0), 2)
+
+    def test_duplicate_apps_failures_stop_before_bulk_updates(self):
+        # arrange
+        mock_api: CloudShellAPISession = Mock()
+        app1 = Mock()
+        app1.Name = "app1"
+        self.init_env_logic._create_duplication_plan = Mock(
+            side_effect=lambda app: AppDuplicationPlan(app, Mock()))
+        self.reservation_snapshot.get_service_positions = Mock(
+            return_value={"app1": Position(0, 0)})
+        self.init_env_logic._env_data.users_list = ["user1", "user2"]
+        self.init_env_logic._create_duplicate_app_connectors_requests = Mock(return_value=([Mock()], []))
+
+        def duplicate_app(api, new_app_name, plan, sandbox_id, app_pos, user_index):
+            if user_index == 1:
+                raise Exception("quota exceeded")
+            return Mock()
+        self.init_env_logic._duplicate_app_and_get_update_request = Mock(side_effect=duplicate_app)
+
+        # act & assert
+        with self.assertRaisesRegex(Exception, "1 out of 2 apps: 2_app1"):
+            self.init_env_logic._duplicate_apps(mock_api, [app1], {"app1": []}, "sandbox_id")
+        mock_api.EditAppsInReservation.assert_not_called()
+        mock_api.SetConnectorsInReservation.assert_not_called()
+
     def test_duplicate_apps_none(self):
         # arrange
         mock_api: CloudShellAPISession = Mock()
@@ -164,7 +282,8 @@ class TestInitializeEnvironmentLogic(unittest.TestCase):
         mock_apps: List[ReservationAppResource] = [mock_app]
         mock_app_connectors: Dict[str, List[Connector]] = MagicMock()
         mock_sandbox_id: str = Mock()
-        self.init_env_logic._components_service.get_apps_to_duplicate = Mock(return_value=[])
+        self.components_service.get_apps_to_duplicate = Mock(return_value=[])
+        self.init_env_logic._create_duplication_plan = Mock()
         service_app_positions_dict = MagicMock()
         mock_service_app_positions = Mock()
         service_app_positions_dict.__getitem__ = MagicMock(return_value=mock_service_app_positions)
@@ -175,31 +294,67 @@ class TestInitializeEnvironmentLogic(unittest.TestCase):
         return_val = self.init_env_logic._duplicate_apps(mock_api, mock_apps, mock_app_connectors, mock_sandbox_id)
 
         # assert
+        self.components_service.get_apps_to_duplicate.assert_called_once_with(mock_apps)
+        self.init_env_logic._create_duplication_plan.assert_not_called()
         mock_api.EditAppsInReservation.assert_not_called()
         mock_api.SetConnectorsInReservation.assert_not_called()
         self.assertEqual(return_val, [])
 
     def test_get_private_ip_value_for_duplicate_app(self):
         # arrange
-        mock_app: ReservationAppResource = Mock()
-        mock_deployment_path: DeploymentPathInfo = Mock()
-        self.init_env_logic._components_service.get_default_deployment_option = Mock(return_value=mock_deployment_path)
-        mock_requested_ips_string = Mock()
-        self.init_env_logic._components_service.get_deployment_attribute_value = Mock(
-            return_value=mock_requested_ips_string)
-        mock_app_duplicate_increment_octet = Mock()
-        self.init_env_logic._config.app_duplicate_increment_octet = mock_app_duplicate_increment_octet
-        mock_calculated_ip_increment = Mock()
-        self.init_env_logic._calculate_IP_increment = Mock(return_value=mock_calculated_ip_increment)
-        mock_user_index = Mock()
+        plan = AppDuplicationPlan(Mock(), Mock(), ["10.0.0.11", "10.0.0.21"])
+
+        # act
+        return_value = self.init_env_logic._get_private_ip_value_for_duplicate_app(plan, 1)
+
+        # assert
+        self.assertEqual(return_value, "10.0.0.21")
+
+    def test_get_private_ip_value_for_duplicate_app_without_private_ip(self):
+        # arrange
+        plan = AppDuplicationPlan(Mock(), Mock())
+
+        # act
+        return_value = self.init_env_logic._get_private_ip_value_for_duplicate_app(plan, 0)
+
+        # assert
+        self.assertIsNone(return_value)
+
+    def test_create_duplication_plan(self):
+        # arrange
+        app = Mock()
+        default_deployment = Mock()
+        self.components_service.get_default_deployment_option = Mock(return_value=default_deployment)
+        self.components_service.get_deployment_attribute_value = Mock(return_value="10.0.0.1")
+        self.env_data.users_list = ["user1", "user2"]
+        self.config.app_duplicate_ip_increment = 10
+        ips_increment_provider = self.init_env_logic._ips_increment_provider
 
         # act
-        return_value = self.init_env_logic._get_private_ip_value_for_duplicate_app(mock_app, mock_user_index)
+        plan = self.init_env_logic._create_duplication_plan(app)
+
+        # assert
+        self.assertEqual(plan.default_deployment, default_deployment)
+        self.components_service.get_deployment_attribute_value.assert_called_once_with(default_deployment,
+                                                                                       "Private IP")
+        self.init_env_logic._ips_increment_provider.parse_requested_ips_string.assert_called_once_with("10.0.0.1")
+        ips_increment_provider.increment_requested_ips_template_for_users.assert_called_once_with(
+            ips_increment_provider.parse_requested_ips_string.return_value,
+            self.config.app_duplicate_increment_octet, [10, 20])
+        self.assertEqual(plan.private_ips_per_user,
+                         ips_increment_provider.increment_requested_ips_template_for_users.return_value)
+
+    def test_create_duplication_plan_without_private_ip_does_not_parse_ips(self):
+        # arrange
+        self.components_service.get_default_deployment_option = Mock(return_value=Mock())
+        self.components_service.get_deployment_attribute_value = Mock(return_value=None)
+
+        # act
+        plan = self.init_env_logic._create_duplication_plan(Mock())
+
         # assert
-        self.init_env_logic._calculate_IP_increment.assert_called_once_with(mock_user_index)
-        self.init_env_logic._ips_increment_provider.increment_requested_ips_string.assert_called_with(
-            mock_requested_ips_string, mock_app_duplicate_increment_octet, \
-            mock_calculated_ip_increment)
+        self.assertIsNone(plan.private_ips_per_user)
+        self.init_env_logic._ips_increment_provider.parse_requested_ips_string.assert_not_called()
 
     def test_prepare_requested_vnic_attr_connector_changes(self):
         # arrange
@@ -244,10 +399,10 @@ class TestInitializeEnvironmentLogic(unittest.TestCase):
         self.init_env_logic._config.app_duplicate_ip_increment = random.randint(0, 100)
         self.init_env_logic._get_private_ip_value_for_duplicate_app = Mock()
         default_deployment_option = Mock()
-        self.components_service.get_default_deployment_option.return_value = default_deployment_option
+        plan = AppDuplicationPlan(mock_app, default_deployment_option)
 
         # act
-        self.init_env_logic._duplicate_app_and_get_update_request(mock_api, mock_new_app_name, mock_app,
+        self.init_env_logic._duplicate_app_and_get_update_request(mock_api, mock_new_app_name, plan,
                                                                   mock_sandbox_id, mock_app_pos, mock_user_index)
 
         # assert
@@ -256,5 +411,6 @@ class TestInitializeEnvironmentLogic(unittest.TestCase):
                                                              appName=mock_app.AppTemplateName,
                                                              deploymentPath=default_deployment_option.Name,
                                                              positionX=mock_new_app_pos.X, positionY=mock_new_app_pos.Y)
-        self.init_env_logic._get_private_ip_value_for_duplicate_app.assert_called_once()
+        self.init_env_logic._get_private_ip_value_for_duplicate_app.assert_called_once_with(plan, mock_user_index)
         self.init_env_logic._components_service.create_update_app_request.assert_called_once()
+        self.components_service.get_default_deployment_option.assert_not_called()
@@ -0,0 +1,98 @@
+import threading
+import unittest
+
+from cloudshell.orch.training.utils.parallel import ParallelUtils, ParallelTaskResult
+
+
+class TestParallelUtils(unittest.TestCase):
+
+    def test_run_in_parallel_keeps_items_order(self):
+        # act
+        results = ParallelUtils.run_in_parallel(lambda x: x * 2, range(20), 5)
+
+        # assert
+        self.assertEqual([result.item for result in results], list(range(20)))
+        self.assertEqual([result.result for result in results], [x * 2 for x in range(20)])
+
+    def test_run_in_parallel_captures_errors_per_item(self):
+        def func(x):
+            if x % 2:
+                raise ValueError(x)
+            return x
+
+        # act
+        results = ParallelUtils.run_in_parallel(func, range(4), 2)
+
+        # assert
+        failures = ParallelUtils.get_failures(results)
+        self.assertEqual([failure.item for failure in failures], [1, 3])
+        self.assertTrue(all(isinstance(failure.error, ValueError) for failure in failures))
+        self.assertTrue(results[0].succeeded)
+
+    def test_run_in_parallel_bounded_concurrency(self):
+        # arrange
+        lock = threading.Lock()
+        barrier = threading.Barrier(3, timeout=5)
+        state = {'running': 0, 'max_running': 0}
+
+        def func(x):
+            with lock:
+                state['running'] += 1
+                state['max_running'] = max(state['max_running'], state['running'])
+            try:
+                barrier.wait()
+            except threading.BrokenBarrierError:
+                pass
+            with lock:
+                state['running'] -= 1
+
+        # act
+        ParallelUtils.run_in_parallel(func, range(9), 3)
+
+        # assert
+        self.assertEqual(state['max_running'], 3)
+
+    def test_run_in_parallel_single_worker_runs_inline(self):
+        # arrange
+        thread_ids = set()
+
+        # act
+        ParallelUtils.run_in_parallel(lambda x: thread_ids.add(threading.get_ident()), range(3), 1)
+
+        # assert
+        self.assertEqual(thread_ids, {threading.get_ident()})
+
+    def test_run_as_items_arrive_processes_items_while_producing(self):
+        # arrange
+        first_item_processed = threading.Event()
+
+        def producer():
+            yield 1
+            # the second item is produced only after the first one was already processed by a worker
+            self.assertTrue(first_item_processed.wait(timeout=5))
+            yield 2
+
+        # act
+        results = ParallelUtils.run_as_items_arrive(lambda x: first_item_processed.set() or x * 10, producer(), 2)
+
+        # assert
+        self.assertEqual([result.result for result in results], [10, 20])
+
+    def test_raise_on_failures(self):
+        # arrange
+        results = [ParallelTaskResult({'name': 'a'}), ParallelTaskResult({'name': 'b'}, error=Exception('b failed')),
+                   ParallelTaskResult({'name': 'c'}, error=Exception('c failed'))]
+
+        # act
+        with self.assertRaises(Exception) as context:
+            ParallelUtils.raise_on_failures(results, "Doing", "things", describe_item=lambda item: item['name'])
+
+        # assert
+        self.assertEqual(str(context.exception), "Doing failed for 2 out of 3 things: b, c. First error: b failed")
+
+    def test_raise_on_failures_all_succeeded(self):
+        # act
+        ParallelUtils.raise_on_failures([ParallelTaskResult('a'), ParallelTaskResult('b')], "Doing")
+
+        # assert
+        self.assertEqual(ParallelUtils.get_failures_summary([ParallelTaskResult('a')], "Doing"), "")
@@ -0,0 +1,47 @@
+import unittest
+
+from cloudshell.orch.training.models.polling_policy import PollingPolicy
+
+
+class TestPollingPolicy(unittest.TestCase):
+
+    def test_get_interval_backoff_up_to_max(self):
+        # arrange
+        policy = PollingPolicy(initial_interval=1, max_interval=10, backoff_factor=2, jitter=0)
+
+        # act
+        intervals = [policy.get_interval(attempt) for attempt in range(6)]
+
+        # assert
+        self.assertEqual(intervals, [1, 2, 4, 8, 10, 10])
+
+    def test_get_interval_with_jitter(self):
+        # arrange
+        policy = PollingPolicy(initial_interval=10, max_interval=10, jitter=0.2)
+
+        # act
+        intervals = [policy.get_interval(0) for _ in range(100)]
+
+        # assert
+        self.assertTrue(all(8 <= interval <= 12 for interval in intervals))
+        self.assertGreater(len(set(intervals)), 1)
+
+    def test_is_deadline_exceeded(self):
+        # arrange
+        policy = PollingPolicy(deadline=60)
+
+        # act & assert
+        self.assertFalse(policy.is_deadline_exceeded(59))
+        self.assertTrue(policy.is_deadline_exceeded(60))
+        self.assertFalse(PollingPolicy().is_deadline_exceeded(10 ** 6))
+
+    def test_validation(self):
+        # act & assert
+        with self.assertRaises(ValueError):
+            PollingPolicy(initial_interval=0)
+        with self.assertRaises(ValueError):
+            PollingPolicy(initial_interval=10, max_interval=5)
+        with self.assertRaises(ValueError):
+            PollingPolicy(backoff_factor=0.5)
+        with self.assertRaises(ValueError):
+            PollingPolicy(jitter=1)
@@ -2,7 +2,8 @@ import unittest
 
 from mock import Mock, call, patch
 
-from cloudshell.orch.training.services.ip_increment_strategy import RequestedIPsIncrementStrategy
+from cloudshell.orch.training.services.ip_increment_strategy import RequestedIPsIncrementStrategy, RequestedIP
+from cloudshell.orch.training.services.ips_handler import IPsHandlerService
 
 
 class TestRequestedIPsIncrementStrategy(unittest.TestCase):
@@ -75,4 +76,108 @@ class TestRequestedIPsIncrementStrategy(unittest.TestCase):
                                                                call('z', '/24', 10)])
 
     def _change_req_ip(self, *args, **kwargs):
-        return args[0] + "'"
\ No newline at end of file
+        return args[0] + "'"
+
+
+class TestRequestedIPsTemplate(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ip_increment_strategy = RequestedIPsIncrementStrategy(IPsHandlerService(), Mock())
+
+    def test_parse_requested_ips_string(self):
+        # act
+        result = self.ip_increment_strategy.parse_requested_ips_string('10.0.0.1, 10.0.1.5-10;192.168.1.1')
+
+        # assert
+        self.assertEqual(result, [[RequestedIP(0x0A000001, None), RequestedIP(0x0A000105, 10)],
+                                  [RequestedIP(0xC0A80101, None)]])
+
+    def test_parse_requested_ips_string_invalid_ip(self):
+        # act & assert
+        with self.assertRaises(ValueError):
+            self.ip_increment_strategy.parse_requested_ips_string('10.0.0.1;10.0.0')
+
+    def test_increment_requested_ips_template_same_as_string(self):
+        # arrange
+        requested_ips_string = '10.0.0.1, 10.0.1.5-10;192.168.1.1'
+        template = self.ip_increment_strategy.parse_requested_ips_string(requested_ips_string)
+
+        for increment_octet in ['/24', '/16', '/8']:
+            # act
+            result = self.ip_increment_strategy.increment_requested_ips_template_for_users(template, increment_octet,
+                                                                                           [10, 20, 30])
+
+            # assert
+            self.assertEqual(result, [self.ip_increment_strategy.increment_requested_ips_string(
+                requested_ips_string, increment_octet, increment_size) for increment_size in [10, 20, 30]])
+
+    def test_increment_requested_ips_template_for_users(self):
+        # arrange
+        template = self.ip_increment_strategy.parse_requested_ips_string('10.0.0.1,10.0.1.5-10;192.168.1.1')
+
+        # act
+        result = self.ip_increment_strategy.increment_requested_ips_template_for_users(template, '/24', [10, 20])
+
+        # assert
+        self.assertEqual(result, ['10.0.0.11,10.0.1.15-20;192.168.1.11', '10.0.0.21,10.0.1.25-30;192.168.1.21'])
+
+    def test_increment_requested_ips_template_for_users_range_not_incremented_in_higher_octet(self):
+        # arrange
+        template = self.ip_increment_strategy.parse_requested_ips_string('10.0.1.5-10')
+
+        # act
+        result = self.ip_increment_strategy.increment_requested_ips_template_for_users(template, '/16', [1, 2])
+
+        # assert
+        self.assertEqual(result, ['10.0.2.5-10', '10.0.3.5-10'])
+
+    def test_increment_requested_ips_template_for_users_octet_overflow(self):
+        # arrange
+        template = self.ip_increment_strategy.parse_requested_ips_string('10.0.0.1;10.0.0.200')
+
+        # act & assert
+        with self.assertRaisesRegex(ValueError, '10.0.0.200'):
+            self.ip_increment_strategy.increment_requested_ips_template_for_users(template, '/24', [10, 60])
+
+    def test_increment_requested_ips_template_for_users_range_overflow(self):
+        # arrange
+        template = self.ip_increment_strategy.parse_requested_ips_string('10.0.0.1-250')
+
+        # act & assert
+        with self.assertRaises(ValueError):
+            self.ip_increment_strategy.increment_requested_ips_template_for_users(template, '/24', [10])
+
+    def test_increment_requested_ips_template_for_1000_users(self):
+        # arrange
+        requested_ips_string = '10.0.0.1,10.0.0.5-10;172.16.0.1'
+        # an octet holds only 256 values, so the sizes repeat to keep 1000 users in range
+        increment_sizes = [user_index % 200 + 1 for user_index in range(1000)]
+
+        # act
+        template = self.ip_increment_strategy.parse_requested_ips_string(requested_ips_string)
+        result = self.ip_increment_strategy.increment_requested_ips_template_for_users(template, '/16',
+                                                                                       increment_sizes)
+
+        # assert
+        self.assertEqual(len(result), 1000)
+        self.assertEqual(result[0], '10.0.1.1,10.0.1.5-10;172.16.1.1')
+        for user_index in [1, 199, 200, 999]:
+            self.assertEqual(result[user_index], self.ip_increment_strategy.increment_requested_ips_string(
+                requested_ips_string, '/16', increment_sizes[user_index]))
+
+    def test_increment_requested_ips_template_for_1000_users_overflow_detected_up_front(self):
+        # arrange
+        template = self.ip_increment_strategy.parse_requested_ips_string('10.0.0.1')
+        increment_sizes = [(user_index + 1) * 10 for user_index in range(1000)]
+        self.ip_increment_strategy._increment_requested_ip_for_users = Mock()
+
+        # act & assert
+        with self.assertRaises(ValueError):
+            self.ip_increment_strategy.increment_requested_ips_template_for_users(template, '/24', increment_sizes)
+        self.ip_increment_strategy._increment_requested_ip_for_users.assert_not_called()
+
+    def test_increment_requested_ips_template_invalid_octet(self):
+        # act & assert
+        with self.assertRaises(ValueError):
+            self.ip_increment_strategy.increment_requested_ips_template_for_users([[RequestedIP('10.0.0.1', None)]],
+                                                                           '/26', [10])
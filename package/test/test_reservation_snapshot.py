@@ -0,0 +1,165 @@
+import unittest
+
+from cloudshell.api.cloudshell_api import CloudShellAPISession, ResourceDiagramLayoutInfo, \
+    ReservationDiagramLayoutResponseInfo, AppInfo
+from cloudshell.workflow.orchestration.components import Components
+from mock import Mock
+
+from cloudshell.orch.training.models.position import Position
+from cloudshell.orch.training.services.reservation_snapshot import ReservationSnapshotService
+
+
+class TestReservationSnapshotService(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.sandbox = Mock()
+        self.api = self.sandbox.automation_api
+        self.snapshot = ReservationSnapshotService(self.sandbox)
+
+    def test_get_details_fetched_once(self):
+        # act
+        first = self.snapshot.get_details()
+        second = self.snapshot.get_details()
+
+        # assert
+        self.api.GetReservationDetails.assert_called_once_with(self.sandbox.id, disableCache=True)
+        self.assertEqual(first, self.api.GetReservationDetails.return_value.ReservationDescription)
+        self.assertEqual(second, first)
+        self.assertEqual(self.snapshot.fetches_count, 1)
+        self.assertEqual(self.snapshot.avoided_fetches_count, 1)
+
+    def test_get_service_positions(self):
+        # arrange
+        self.api.GetReservationServicesPositions.return_value = Mock(
+            ResourceDiagramLayouts=[Mock(ResourceName='s1', X=10, Y=20)])
+
+        # act
+        self.snapshot.get_service_positions()
+        result = self.snapshot.get_service_positions()
+
+        # assert
+        self.assertEqual(result, {'s1': Position(10, 20)})
+        self.api.GetReservationServicesPositions.assert_called_once_with(self.sandbox.id)
+
+    def test_get_service_positions_of_services_and_apps(self):
+        # arrange
+        mock_api: CloudShellAPISession = self.api
+        mock_service_position: ResourceDiagramLayoutInfo = Mock(ResourceName='service', X=10, Y=20)
+        mock_app_position: ResourceDiagramLayoutInfo = Mock(ResourceName='app', X=30, Y=40)
+        mock_reservation_services_positions: ReservationDiagramLayoutResponseInfo = Mock(
+            ResourceDiagramLayouts=[mock_service_position, mock_app_position])
+        mock_api.GetReservationServicesPositions = Mock(return_value=mock_reservation_services_positions)
+
+        # act
+        result = self.snapshot.get_service_positions()
+
+        # assert
+        self.assertEqual(result, {'service': Position(10, 20), 'app': Position(30, 40)})
+
+    def test_get_resource_positions(self):
+        # arrange
+        self.api.GetReservationResourcesPositions.return_value = Mock(
+            ResourceDiagramLayouts=[Mock(ResourceName='r1', X=1, Y=2), Mock(ResourceName='r2', X=3, Y=4)])
+
+        # act
+        self.snapshot.get_resource_positions()
+        result = self.snapshot.get_resource_positions()
+
+        # assert
+        self.assertEqual(result, {'r1': Position(1, 2), 'r2': Position(3, 4)})
+        self.api.GetReservationResourcesPositions.assert_called_once_with(self.sandbox.id)
+
+    def test_refresh_components_uses_snapshot_details(self):
+        # arrange
+        resource = Mock(AppDetails=None)
+        resource.Name = 'r1'
+        service = Mock(Alias='s1')
+        details = Mock(Resources=[resource], Services=[service], Apps=[])
+        self.api.GetReservationDetails.return_value = Mock(ReservationDescription=details)
+        self.sandbox.components = Components([], [], [])
+
+        # act
+        result = self.snapshot.get_details()
+        self.snapshot.refresh_components()
+        self.snapshot.refresh_components()
+
+        # assert
+        self.assertEqual(result, details)
+        self.api.GetReservationDetails.assert_called_once()
+        self.assertEqual(self.sandbox.components.resources, {'r1': resource})
+        self.assertEqual(self.sandbox.components.services, {'s1': service})
+        self.assertEqual(self.snapshot.avoided_fetches_count, 2)
+
+    def test_refresh_components_adds_apps_and_deployed_app_resources(self):
+        # arrange
+        existing_app = Mock(DeploymentPaths=[Mock()])
+        existing_app.Name = 'existing_app'
+        new_app = Mock(DeploymentPaths=[Mock()])
+        new_app.Name = 'new_app'
+        app_without_paths = Mock(DeploymentPaths=[])
+        app_without_paths.Name = None
+        deployed_resource = Mock(AppDetails=Mock(spec=AppInfo, AppName='new_app'))
+        deployed_resource.Name = 'new_app_vm'
+        details = Mock(Resources=[deployed_resource], Services=[], Apps=[existing_app, new_app, app_without_paths])
+        self.api.GetReservationDetails.return_value = Mock(ReservationDescription=details)
+        self.sandbox.components = Components([], [], [existing_app])
+        existing_app_component = self.sandbox.components.apps['existing_app']
+
+        # act
+        self.snapshot.refresh_components()
+
+        # assert
+        self.assertEqual(set(self.sandbox.components.apps), {'existing_app', 'new_app'})
+        self.assertIs(self.sandbox.components.apps['existing_app'], existing_app_component)
+        self.assertEqual(self.sandbox.components.apps['new_app'].deployed_app, deployed_resource)
+        self.assertEqual(self.sandbox.components.resources, {'new_app_vm': deployed_resource})
+
+    def test_prefetch(self):
+        # arrange
+        self.api.GetReservationResourcesPositions.return_value = Mock(
+            ResourceDiagramLayouts=[Mock(ResourceName='r1', X=1, Y=2)])
+        self.api.GetReservationServicesPositions.return_value = Mock(
+            ResourceDiagramLayouts=[Mock(ResourceName='s1', X=3, Y=4)])
+        other_read = Mock(return_value="sandbox data")
+
+        # act
+        result = self.snapshot.prefetch(4, [other_read])
+        details = self.snapshot.get_details()
+        resource_positions = self.snapshot.get_resource_positions()
+        service_positions = self.snapshot.get_service_positions()
+
+        # assert
+        self.assertEqual(result, ["sandbox data"])
+        self.assertEqual(details, self.api.GetReservationDetails.return_value.ReservationDescription)
+        self.assertEqual(resource_positions, {'r1': Position(1, 2)})
+        self.assertEqual(service_positions, {'s1': Position(3, 4)})
+        self.api.GetReservationDetails.assert_called_once_with(self.sandbox.id, disableCache=True)
+        self.api.GetReservationResourcesPositions.assert_called_once()
+        self.api.GetReservationServicesPositions.assert_called_once()
+        self.assertEqual(self.snapshot.fetches_count, 3)
+        self.assertEqual(self.snapshot.avoided_fetches_count, 3)
+
+    def test_prefetch_failure(self):
+        # arrange
+        self.api.GetReservationServicesPositions.side_effect = Exception("error")
+
+        # act & assert
+        with self.assertRaisesRegex(Exception, "error"):
+            self.snapshot.prefetch(4, [Mock()])
+
+    def test_invalidate(self):
+        # arrange
+        self.api.GetReservationServicesPositions.return_value = Mock(ResourceDiagramLayouts=[])
+
+        # act
+        self.snapshot.get_details()
+        self.snapshot.get_service_positions()
+        self.snapshot.invalidate()
+        self.snapshot.get_details()
+        self.snapshot.get_service_positions()
+
+        # assert
+        self.assertEqual(self.api.GetReservationDetails.call_count, 2)
+        self.assertEqual(self.api.GetReservationServicesPositions.call_count, 2)
+        self.assertEqual(self.snapshot.fetches_count, 4)
+        self.assertEqual(self.snapshot.avoided_fetches_count, 0)
@@ -0,0 +1,92 @@
+import unittest
+
+from mock import Mock, call, patch, ANY
+
+from cloudshell.orch.training.models.position import Position
+from cloudshell.orch.training.services.resource_positions import ResourcePositionsUpdater
+
+
+class TestResourcePositionsUpdater(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.sandbox = Mock()
+        self.updater = ResourcePositionsUpdater(self.sandbox, 4)
+
+    def test_flush_all(self):
+        # arrange
+        self.updater.add('res1', 'r1', Position(10, 20))
+        self.updater.add('res1', 'r2', Position(30, 40))
+        self.updater.add('res2', 'r1', Position(50, 60))
+
+        # act
+        self.updater.flush()
+
+        # assert
+        self.sandbox.automation_api.SetReservationResourcePosition.assert_has_calls([
+            call('res1', 'r1', 10, 20),
+            call('res1', 'r2', 30, 40),
+            call('res2', 'r1', 50, 60)], any_order=True)
+        self.assertEqual(self.updater.calls_count, 3)
+        self.assertGreaterEqual(self.updater.elapsed_seconds, 0)
+
+    def test_flush_single_reservation(self):
+        # arrange
+        self.updater.add('res1', 'r1', Position(10, 20))
+        self.updater.add('res2', 'r1', Position(50, 60))
+
+        # act
+        self.updater.flush('res2')
+
+        # assert
+        self.sandbox.automation_api.SetReservationResourcePosition.assert_called_once_with('res2', 'r1', 50, 60)
+
+        # act - remaining placements are still pending
+        self.updater.flush()
+
+        # assert
+        self.sandbox.automation_api.SetReservationResourcePosition.assert_called_with('res1', 'r1', 10, 20)
+        self.assertEqual(self.updater.calls_count, 2)
+
+    @patch('cloudshell.orch.training.services.resource_positions.ParallelUtils.run_in_parallel')
+    def test_flush_single_reservation_is_serial(self, run_in_parallel_mock):
+        # arrange
+        run_in_parallel_mock.return_value = []
+        self.updater.add('res1', 'r1', Position(10, 20))
+        self.updater.add('res1', 'r2', Position(30, 40))
+
+        # act
+        self.updater.flush('res1')
+
+        # assert
+        run_in_parallel_mock.assert_called_once_with(ANY, ANY, 1)
+
+    def test_same_resource_placed_once(self):
+        # arrange
+        self.updater.add('res1', 'r1', Position(10, 20))
+        self.updater.add('res1', 'r1', Position(30, 40))
+
+        # act
+        self.updater.flush()
+
+        # assert
+        self.sandbox.automation_api.SetReservationResourcePosition.assert_called_once_with('res1', 'r1', 30, 40)
+
+    def test_flush_nothing_pending(self):
+        # act
+        self.updater.flush()
+
+        # assert
+        self.sandbox.automation_api.SetReservationResourcePosition.assert_not_called()
+        self.assertEqual(self.updater.calls_count, 0)
+
+    def test_flush_raises_on_failures(self):
+        # arrange
+        self.sandbox.automation_api.SetReservationResourcePosition.side_effect = Exception('error')
+        self.updater.add('res1', 'r1', Position(10, 20))
+        self.updater.add('res1', 'r2', Position(10, 20))
+
+        # act & assert
+        with self.assertRaises(Exception) as context:
+            self.updater.flush()
+
+        self.assertIn('r1, r2', str(context.exception))
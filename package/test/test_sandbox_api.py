@@ -1,9 +1,13 @@
+import json
+import threading
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-from mock import Mock
+import requests
 
-from cloudshell.orch.training.services.sandbox_api import SandboxAPIService
-from cloudshell.orch.training.services.sandbox_components import SandboxComponentsHelperService
+from mock import Mock, patch
+
+from cloudshell.orch.training.services.sandbox_api import SandboxAPIService, ADMIN_TOKEN_TTL_SECONDS
 
 class TestSandboxApiService(unittest.TestCase):
     def setUp(self) -> None:
@@ -19,7 +23,7 @@ class TestSandboxApiService(unittest.TestCase):
         self.sandbox_api_service._requests_session.post = Mock(return_value=mock_post_return)
 
         # act
-        returned_token = self.sandbox_api_service.create_token(self.api_token,self.user,mock_domain)
+        returned_token = self.sandbox_api_service.create_token(self.user,mock_domain)
 
         # assert
         self.sandbox_api_service._requests_session.post.assert_called_once()
@@ -32,7 +36,7 @@ class TestSandboxApiService(unittest.TestCase):
         self.sandbox_api_service._requests_session.delete = Mock(return_value=mock_delete_return)
 
         # act
-        delete_return = self.sandbox_api_service.delete_token(self.api_token,self.user)
+        delete_return = self.sandbox_api_service.delete_token(self.user)
 
         # assert
         self.sandbox_api_service._requests_session.delete.assert_called_once()
@@ -45,7 +49,7 @@ class TestSandboxApiService(unittest.TestCase):
         self.sandbox_api_service._requests_session.delete = Mock(return_value=mock_delete_return)
 
         # act
-        delete_return = self.sandbox_api_service.delete_token(self.api_token,self.user)
+        delete_return = self.sandbox_api_service.delete_token(self.user)
 
         # assert
         self.sandbox_api_service._requests_session.delete.assert_called_once()
@@ -61,3 +65,131 @@ class TestSandboxApiService(unittest.TestCase):
         # assert
         self.sandbox_api_service._requests_session.put.assert_called_once()
         self.assertEqual(login_return,mock_json.json())
+
+    def test_admin_token_cached(self):
+        # arrange
+        self.sandbox_api_service._requests_session.put = Mock(return_value=Mock(json=Mock(return_value='admin')))
+        self.sandbox_api_service._requests_session.post = Mock(return_value=Mock(status_code=200))
+
+        # act
+        self.sandbox_api_service.create_token('user1', 'Global')
+        self.sandbox_api_service.create_token('user2', 'Global')
+
+        # assert
+        self.sandbox_api_service._requests_session.put.assert_called_once()
+        self.assertEqual(self.sandbox_api_service._requests_session.post.call_count, 2)
+        self.assertEqual(self.sandbox_api_service._requests_session.post.call_args[1]['headers']['Authorization'],
+                         'Basic admin')
+
+    @patch('cloudshell.orch.training.services.sandbox_api.monotonic')
+    def test_admin_token_refreshed_after_expiry(self, monotonic_mock):
+        # arrange
+        self.sandbox_api_service._requests_session.put = Mock(return_value=Mock(json=Mock(return_value='admin')))
+        monotonic_mock.return_value = 0
+
+        # act
+        self.sandbox_api_service.get_admin_token()
+        monotonic_mock.return_value = ADMIN_TOKEN_TTL_SECONDS - 1
+        self.sandbox_api_service.get_admin_token()
+        monotonic_mock.return_value = ADMIN_TOKEN_TTL_SECONDS + 1
+        self.sandbox_api_service.get_admin_token()
+
+        # assert
+        self.assertEqual(self.sandbox_api_service._requests_session.put.call_count, 2)
+
+    def test_admin_token_refreshed_on_401(self):
+        # arrange
+        self.sandbox_api_service._requests_session.put = Mock(
+            side_effect=[Mock(json=Mock(return_value='old_admin')), Mock(json=Mock(return_value='new_admin'))])
+        self.sandbox_api_service._requests_session.delete = Mock(side_effect=[Mock(status_code=401),
+                                                                              Mock(status_code=200)])
+
+        # act
+        delete_return = self.sandbox_api_service.delete_token('user_token')
+
+        # assert
+        self.assertTrue(delete_return)
+        self.assertEqual(self.sandbox_api_service._requests_session.put.call_count, 2)
+        self.assertEqual(self.sandbox_api_service._requests_session.delete.call_args[1]['headers']['Authorization'],
+                         'Basic new_admin')
+        self.assertEqual(self.sandbox_api_service.get_admin_token(), 'new_admin')
+
+
+class StubSandboxAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_PUT(self):
+        self._read_body()
+        self._respond(200, 'admin_token')
+
+    def do_DELETE(self):
+        self._read_body()
+        user_token = self.path.split('/')[-1]
+        self._respond(400 if user_token == 'bad_token' else 200, '')
+
+    def _read_body(self):
+        self.server.connections.add(self.client_address)
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length)) if length else None
+
+    def _respond(self, status_code: int, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestSandboxApiServiceWithStubServer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubSandboxAPIHandler)
+        self.server.connections = set()
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+
+        sandbox = Mock()
+        sandbox.connectivityContextDetails.server_address = '127.0.0.1'
+        sandbox.connectivityContextDetails.admin_user = 'admin'
+        sandbox.connectivityContextDetails.admin_pass = 'admin'
+        sandbox.reservationContextDetails.domain = 'Global'
+        self.sandbox_api_service = SandboxAPIService(sandbox, self.server.server_address[1], Mock(),
+                                                     max_concurrency=4, connect_timeout=1, read_timeout=5)
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_delete_tokens_reuses_connections(self):
+        # arrange
+        user_tokens = {f'user{i}': f'token{i}' for i in range(20)}
+
+        # act
+        results = self.sandbox_api_service.delete_tokens(user_tokens)
+
+        # assert
+        self.assertEqual([result.item for result in results], list(user_tokens.keys()))
+        self.assertTrue(all(result.result for result in results))
+        # login once and keep alive connections are reused by the workers
+        self.assertLessEqual(len(self.server.connections), 5)
+
+    def test_delete_tokens(self):
+        # act
+        results = self.sandbox_api_service.delete_tokens({'user1': 'token1', 'user2': 'bad_token'})
+
+        # assert
+        self.assertEqual({result.item: result.result for result in results}, {'user1': True, 'user2': False})
+
+    def test_connection_error_reported_per_user(self):
+        # arrange - nothing listens on the port of a closed server
+        self.server.shutdown()
+        self.server.server_close()
+
+        # act
+        results = self.sandbox_api_service.delete_tokens({'user1': 'token1'})
+
+        # assert
+        self.assertIsInstance(results[0].error, requests.exceptions.ConnectionError)
@@ -4,10 +4,12 @@ from cloudshell.api.cloudshell_api import CloudShellAPISession, GetReservationDe
     ReservedResourceInfo, ServiceInstance, ReservationAppResource
 from cloudshell.api.common_cloudshell_api import CloudShellAPIError
 from cloudshell.workflow.orchestration.sandbox import Sandbox
-from mock import Mock, patch
+from mock import Mock, patch, call
 
+from cloudshell.orch.training.models.polling_policy import PollingPolicy
 from cloudshell.orch.training.services.sandbox_lifecycle import SandboxLifecycleService
-from cloudshell.orch.training.services.users_data_manager import UsersDataManagerService
+from cloudshell.orch.training.services.users_data_manager import UsersDataManagerService, \
+    UsersDataManagerServiceKeys as userDataKeys
 
 
 class TestSandboxCreateService(unittest.TestCase):
@@ -32,7 +34,7 @@ class TestSandboxCreateService(unittest.TestCase):
         # assert
         self.assertEqual(result, new_reservation.Reservation)
 
-    @patch("cloudshell.orch.training.services.sandbox_lifecycle.sleep")
+    @patch("cloudshell.orch.training.services.sandbox_readiness.sleep")
     def test_wait_ready(self, sleep_patch):
         # arrange
         sandbox = Mock(automation_api=Mock())
@@ -44,7 +46,7 @@ class TestSandboxCreateService(unittest.TestCase):
         # act & assert
         sandbox_create_service.wait_ready(Mock(), Mock())
 
-    @patch("cloudshell.orch.training.services.sandbox_lifecycle.sleep")
+    @patch("cloudshell.orch.training.services.sandbox_readiness.sleep")
     def test_wait_error(self, sleep_patch):
         # arrange
         sandbox = Mock(automation_api=Mock())
@@ -56,7 +58,7 @@ class TestSandboxCreateService(unittest.TestCase):
         with self.assertRaises(Exception):
             sandbox_create_service.wait_ready(Mock(), Mock())
 
-    @patch("cloudshell.orch.training.services.sandbox_lifecycle.sleep")
+    @patch("cloudshell.orch.training.services.sandbox_readiness.sleep")
     def test_wait_teardown(self, sleep_patch):
         # arrange
         sandbox = Mock(automation_api=Mock())
@@ -68,7 +70,7 @@ class TestSandboxCreateService(unittest.TestCase):
         with self.assertRaises(Exception):
             sandbox_create_service.wait_ready(Mock(), Mock())
 
-    @patch("cloudshell.orch.training.services.sandbox_lifecycle.sleep")
+    @patch("cloudshell.orch.training.services.sandbox_readiness.sleep")
     def test_wait_completed(self, sleep_patch):
         # arrange
         sandbox = Mock(automation_api=Mock())
@@ -80,6 +82,22 @@ class TestSandboxCreateService(unittest.TestCase):
         with self.assertRaises(Exception):
             sandbox_create_service.wait_ready(Mock(), Mock())
 
+    @patch("cloudshell.orch.training.services.sandbox_readiness.monotonic")
+    @patch("cloudshell.orch.training.services.sandbox_readiness.sleep")
+    def test_wait_ready_with_backoff_and_deadline(self, sleep_patch, monotonic_patch):
+        # arrange
+        sandbox = Mock(automation_api=Mock())
+        sandbox.automation_api.GetReservationStatus = Mock(return_value=self._get_res_status_mock('Started', 'bla'))
+        monotonic_patch.side_effect = [0, 1, 3, 100]
+        polling_policy = PollingPolicy(initial_interval=1, max_interval=10, jitter=0, deadline=50)
+        sandbox_create_service = SandboxLifecycleService(sandbox, Mock(), Mock(), polling_policy)
+
+        # act & assert
+        with self.assertRaises(Exception):
+            sandbox_create_service.wait_ready(Mock(), Mock())
+        sleep_patch.assert_has_calls([call(1), call(2)])
+        self.assertEqual(sleep_patch.call_count, 2)
+
     def _get_res_status_mock(self, status: str, provisioning_status: str) -> Mock:
         return Mock(ReservationSlimStatus=
                     Mock(Status=status, ProvisioningStatus=provisioning_status))
@@ -90,6 +108,9 @@ class TestSandboxTerminateService(unittest.TestCase):
         self.sandbox = Mock()
         self.sandbox_output_service = Mock()
         self.users_data_manager = Mock()
+        # no resources were recorded at setup
+        self.users_data_manager.get_key = Mock(
+            side_effect=lambda user, key: None if key == userDataKeys.ADDED_RESOURCES else "student_res_id")
         self.admin_login_token = Mock()
         self.logic = SandboxLifecycleService(self.sandbox, self.sandbox_output_service,self.users_data_manager)
 
@@ -116,7 +137,7 @@ class TestSandboxTerminateService(unittest.TestCase):
         self.logic.end_student_reservation(Mock(),False)
 
         # assert
-        self.logic._api.ExecuteCommand.assert_called_once_with("mock_user_reservation_id", "mock_resource_name", "Resource", "Power Off", [], True)
+        self.logic._api.ExecuteCommand.assert_called_once_with("mock_user_reservation_id", "mock_resource_name", "Resource", "Power Off", [], False)
 
     def test_end_student_reservation_already_complete(self):
         # arrange
@@ -187,9 +208,10 @@ class TestSandboxTerminateService(unittest.TestCase):
         mock_api.GetReservationDetails = Mock(return_value=mock_get_reservation_details)
 
         # act
-        self.logic.clear_sandbox_components(mock_sandbox)
+        emptied = self.logic.clear_sandbox_components(mock_sandbox)
 
         # assert
+        self.assertTrue(emptied)
         mock_sandbox.automation_api.RemoveResourcesFromReservation.assert_called_once_with(mock_sandbox.id,[mock_resource.Name])
         mock_sandbox.automation_api.RemoveServicesFromReservation.assert_called_once_with(mock_sandbox.id,[mock_service.Alias])
         mock_sandbox.automation_api.RemoveAppFromReservation.assert_called_once_with(mock_sandbox.id,appName=mock_app.Name)
@@ -236,7 +258,114 @@ class TestSandboxTerminateService(unittest.TestCase):
         mock_api.RemoveServicesFromReservation.side_effect = Exception('')
 
         # act
-        self.logic.clear_sandbox_components(mock_sandbox)
+        emptied = self.logic.clear_sandbox_components(mock_sandbox)
+
+        # assert
+        mock_sandbox.logger.exception.assert_called_once()
+        self.assertFalse(emptied)
+
+    def test_end_student_reservation_student_powers_off_apps_concurrently(self):
+        # arrange
+        self.logic = SandboxLifecycleService(self.sandbox, self.sandbox_output_service, self.users_data_manager,
+                                             max_concurrency=4)
+        self.sandbox.id = "res_id"
+        self.sandbox.automation_api.GetReservationStatus.return_value.ReservationSlimStatus.Status = "Started"
+        resources = [Mock(CreatedInReservation="instructor_id") for _ in range(3)]
+        for index, resource in enumerate(resources):
+            resource.Name = f"app{index}"
+        self.sandbox.automation_api.GetReservationDetails.return_value.ReservationDescription.Resources = resources
+
+        def execute_command(reservation_id, app_name, *args):
+            if app_name == "app1":
+                raise Exception("power off failed")
+        self.sandbox.automation_api.ExecuteCommand.side_effect = execute_command
+
+        # act
+        self.logic.end_student_reservation("user", False)
+
+        # assert
+        self.assertEqual(self.sandbox.automation_api.ExecuteCommand.call_count, 3)
+        self.sandbox.automation_api.ExecuteCommand.assert_any_call("res_id", "app2", "Resource", "Power Off", [],
+                                                                   False)
+        self.sandbox_output_service.notify.assert_any_call(
+            '<font style="color:red">Power Off failed for 1 out of 3 apps: app1. First error: power off failed</font>')
+        self.sandbox.automation_api.RemoveResourcesFromReservation.assert_called_once_with(
+            "res_id", ["app0", "app1", "app2"])
+        self.sandbox.automation_api.EndReservation.assert_called_once_with("res_id")
+
+    def test_end_student_reservation_instructor_uses_added_resources(self):
+        # arrange
+        self.sandbox.automation_api.GetReservationStatus.return_value.ReservationSlimStatus.Status = "Started"
+        self.users_data_manager.get_key = Mock(side_effect=lambda user, key: {
+            userDataKeys.SANDBOX_ID: "student_res_id", userDataKeys.ADDED_RESOURCES: ["app1", "shared_app"]}[key])
+
+        # act
+        self.logic.end_student_reservation("user", True)
+
+        # assert
+        self.sandbox.automation_api.GetReservationDetails.assert_not_called()
+        self.sandbox.automation_api.ExecuteCommand.assert_not_called()
+        self.sandbox.automation_api.RemoveResourcesFromReservation.assert_called_once_with(
+            "student_res_id", ["app1", "shared_app"])
+        self.sandbox.automation_api.EndReservation.assert_called_once_with("student_res_id")
+
+    def test_end_student_reservation_instructor_without_added_resources_fetches_details(self):
+        # arrange
+        self.sandbox.automation_api.GetReservationStatus.return_value.ReservationSlimStatus.Status = "Started"
+        resource = Mock(VmDetails="vm", CreatedInReservation="instructor_id")
+        resource.Name = "app1"
+        self.sandbox.automation_api.GetReservationDetails.return_value.ReservationDescription.Resources = [resource]
+
+        # act
+        self.logic.end_student_reservation("user", True)
+
+        # assert
+        self.sandbox.automation_api.GetReservationDetails.assert_called_once_with("student_res_id")
+        self.sandbox.automation_api.RemoveResourcesFromReservation.assert_called_once_with("student_res_id", ["app1"])
+
+    def test_clear_sandbox_components_removes_apps_concurrently(self):
+        # arrange
+        self.logic = SandboxLifecycleService(self.sandbox, self.sandbox_output_service, self.users_data_manager,
+                                             max_concurrency=4)
+        self.sandbox.id = "sandbox_id"
+        details = self.sandbox.automation_api.GetReservationDetails.return_value.ReservationDescription
+        details.Resources = []
+        details.Services = []
+        apps = [Mock() for _ in range(3)]
+        for index, app in enumerate(apps):
+            app.Name = f"app{index}"
+        details.Apps = apps
+
+        def remove_app(sandbox_id, appName):
+            if appName == "app1":
+                raise Exception("remove failed")
+        self.sandbox.automation_api.RemoveAppFromReservation.side_effect = remove_app
+
+        # act
+        with self.assertRaisesRegex(Exception, "Removing apps failed for 1 out of 3 apps: app1"):
+            self.logic.clear_sandbox_components(self.sandbox)
+
+        # assert
+        self.sandbox.automation_api.RemoveAppFromReservation.assert_has_calls(
+            [call("sandbox_id", appName="app0"), call("sandbox_id", appName="app1"),
+             call("sandbox_id", appName="app2")], any_order=True)
+        self.sandbox_output_service.debug_print.assert_called_with("Removed 2 apps, 1 failed, using 3 calls")
+
+    def test_end_student_reservation_instructor_out_of_date_added_resources_reads_details(self):
+        # arrange
+        self.sandbox.automation_api.GetReservationStatus.return_value.ReservationSlimStatus.Status = "Started"
+        self.users_data_manager.get_key = Mock(side_effect=lambda user, key: {
+            userDataKeys.SANDBOX_ID: "student_res_id", userDataKeys.ADDED_RESOURCES: ["app1", "deleted_app"]}[key])
+        resource = Mock(VmDetails="vm", CreatedInReservation="instructor_id")
+        resource.Name = "app1"
+        self.sandbox.automation_api.GetReservationDetails.return_value.ReservationDescription.Resources = [resource]
+        self.sandbox.automation_api.RemoveResourcesFromReservation.side_effect = [
+            CloudShellAPIError('100', 'resource not found', ''), None]
+
+        # act
+        self.logic.end_student_reservation("user", True)
 
         # assert
-        mock_sandbox.logger.exception.assert_called_once()
\ No newline at end of file
+        self.sandbox.automation_api.RemoveResourcesFromReservation.assert_has_calls([
+            call("student_res_id", ["app1", "deleted_app"]), call("student_res_id", ["app1"])])
+        self.sandbox.automation_api.EndReservation.assert_called_once_with("student_res_id")
@@ -1,6 +1,7 @@
+import threading
 import unittest
 
-from mock import Mock
+from mock import Mock, call
 
 from cloudshell.orch.training.services.sandbox_output import SandboxOutputService
 
@@ -41,4 +42,97 @@ class TestSandboxOutput(unittest.TestCase):
         output_service.debug_print(message)
 
         # assert
-        sandbox.automation_api.WriteMessageToReservationOutput.assert_not_called()
\ No newline at end of file
+        sandbox.automation_api.WriteMessageToReservationOutput.assert_not_called()
+
+    def test_buffered_notify_writes_combined_message_on_flush(self):
+        # arrange
+        sandbox = Mock(automation_api=Mock())
+        output_service = SandboxOutputService(sandbox, True, buffered=True, flush_interval=60)
+
+        # act
+        output_service.notify('message1')
+        output_service.debug_print('message2')
+        output_service.notify('message3')
+
+        # assert
+        sandbox.automation_api.WriteMessageToReservationOutput.assert_not_called()
+
+        # act
+        output_service.flush()
+        output_service.flush()
+
+        # assert
+        sandbox.automation_api.WriteMessageToReservationOutput.assert_called_once_with(
+            sandbox.id, 'message1\nmessage2\nmessage3')
+
+    def test_buffered_flush_on_size_threshold(self):
+        # arrange
+        sandbox = Mock(automation_api=Mock())
+        output_service = SandboxOutputService(sandbox, False, buffered=True, flush_interval=60,
+                                              max_buffered_messages=3)
+
+        # act
+        for i in range(7):
+            output_service.notify(f'message{i}')
+
+        # assert
+        sandbox.automation_api.WriteMessageToReservationOutput.assert_has_calls([
+            call(sandbox.id, 'message0\nmessage1\nmessage2'),
+            call(sandbox.id, 'message3\nmessage4\nmessage5')])
+        self.assertEqual(sandbox.automation_api.WriteMessageToReservationOutput.call_count, 2)
+
+    def test_buffered_flush_on_timer(self):
+        # arrange
+        sandbox = Mock(automation_api=Mock())
+        written = threading.Event()
+        sandbox.automation_api.WriteMessageToReservationOutput.side_effect = lambda *args: written.set()
+        output_service = SandboxOutputService(sandbox, False, buffered=True, flush_interval=0.01)
+
+        # act
+        output_service.notify('message')
+
+        # assert
+        self.assertTrue(written.wait(timeout=5))
+        sandbox.automation_api.WriteMessageToReservationOutput.assert_called_once_with(sandbox.id, 'message')
+
+    def test_buffered_failed_flush_keeps_messages(self):
+        # arrange
+        sandbox = Mock(automation_api=Mock())
+        sandbox.automation_api.WriteMessageToReservationOutput.side_effect = [Exception('write failed'), None]
+        output_service = SandboxOutputService(sandbox, False, buffered=True, flush_interval=60)
+        output_service.notify('message1')
+
+        # act
+        with self.assertRaises(Exception):
+            output_service.flush()
+        output_service.notify('message2')
+        output_service.flush()
+
+        # assert
+        sandbox.automation_api.WriteMessageToReservationOutput.assert_called_with(sandbox.id, 'message1\nmessage2')
+
+    def test_buffered_write_does_not_block_buffering(self):
+        # arrange
+        sandbox = Mock(automation_api=Mock())
+        write_started = threading.Event()
+        release_write = threading.Event()
+
+        def write(sandbox_id, message):
+            write_started.set()
+            release_write.wait(5)
+        sandbox.automation_api.WriteMessageToReservationOutput.side_effect = write
+        output_service = SandboxOutputService(sandbox, False, buffered=True, flush_interval=60)
+        output_service.notify('message1')
+        flush_thread = threading.Thread(target=output_service.flush)
+        flush_thread.start()
+        write_started.wait(5)
+
+        # act
+        output_service.notify('message2')
+        release_write.set()
+        flush_thread.join(5)
+        output_service.flush()
+
+        # assert
+        sandbox.automation_api.WriteMessageToReservationOutput.assert_has_calls([call(sandbox.id, 'message1'),
+                                                                                 call(sandbox.id, 'message2')])
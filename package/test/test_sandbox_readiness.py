@@ -0,0 +1,114 @@
+import unittest
+
+from mock import Mock, patch, call
+
+from cloudshell.orch.training.models.polling_policy import PollingPolicy
+from cloudshell.orch.training.services.sandbox_readiness import SandboxReadinessPoller
+
+
+class TestSandboxReadinessPoller(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.sandbox = Mock()
+        self.polling_policy = PollingPolicy(initial_interval=2, max_interval=5, jitter=0)
+        self.poller = SandboxReadinessPoller(self.sandbox, self.polling_policy)
+
+    def _set_statuses(self, statuses: dict):
+        """
+        :param statuses: sandbox id to a list of (status, provisioning status) returned on consecutive polls
+        """
+        def get_reservation_status(sandbox_id):
+            status, provisioning_status = statuses[sandbox_id].pop(0)
+            return Mock(ReservationSlimStatus=Mock(Status=status, ProvisioningStatus=provisioning_status))
+
+        self.sandbox.automation_api.GetReservationStatus = Mock(side_effect=get_reservation_status)
+
+    @patch("cloudshell.orch.training.services.sandbox_readiness.sleep")
+    def test_yields_in_order_of_readiness(self, sleep_patch):
+        # arrange
+        self._set_statuses({
+            'id1': [('Started', 'Setup'), ('Started', 'Setup'), ('Started', 'Ready')],
+            'id2': [('Started', 'Setup'), ('Started', 'Ready')],
+            'id3': [('Started', 'Ready')]})
+
+        # act
+        results = list(self.poller.wait_for_sandboxes({'user1': 'id1', 'user2': 'id2', 'user3': 'id3'}))
+
+        # assert
+        self.assertEqual([result.user for result in results], ['user3', 'user2', 'user1'])
+        self.assertTrue(all(result.is_ready for result in results))
+        # one sleep per tick and not per sandbox
+        self.assertEqual(sleep_patch.call_count, 2)
+        sleep_patch.assert_has_calls([call(2), call(4)])
+        self.assertEqual(self.sandbox.automation_api.GetReservationStatus.call_count, 6)
+
+    @patch("cloudshell.orch.training.services.sandbox_readiness.sleep")
+    def test_yields_failed_sandboxes(self, sleep_patch):
+        # arrange
+        self._set_statuses({
+            'id1': [('Started', 'Setup'), ('Started', 'Error')],
+            'id2': [('Teardown', 'Setup')],
+            'id3': [('Started', 'Setup'), ('Completed', 'Setup')]})
+
+        # act
+        results = list(self.poller.wait_for_sandboxes({'user1': 'id1', 'user2': 'id2', 'user3': 'id3'}))
+
+        # assert
+        self.assertEqual([result.user for result in results], ['user2', 'user1', 'user3'])
+        self.assertTrue(all(result.is_failed and not result.is_ready for result in results))
+
+    @patch("cloudshell.orch.training.services.sandbox_readiness.sleep")
+    def test_no_sandboxes(self, sleep_patch):
+        # act
+        results = list(self.poller.wait_for_sandboxes({}))
+
+        # assert
+        self.assertEqual(results, [])
+        sleep_patch.assert_not_called()
+
+    @patch("cloudshell.orch.training.services.sandbox_readiness.sleep")
+    def test_on_tick_called_every_polling_round(self, sleep_patch):
+        # arrange
+        on_tick = Mock()
+        self._set_statuses({
+            'id1': [('Started', 'Setup'), ('Started', 'Setup'), ('Started', 'Ready')]})
+
+        # act
+        list(self.poller.wait_for_sandboxes({'user1': 'id1'}, on_tick=on_tick))
+
+        # assert
+        self.assertEqual(on_tick.call_count, 3)
+
+    @patch("cloudshell.orch.training.services.sandbox_readiness.sleep")
+    def test_pending_statuses_are_logged_only(self, sleep_patch):
+        # arrange
+        self._set_statuses({
+            'id1': [('Started', 'Setup'), ('Started', 'Ready')]})
+
+        # act
+        list(self.poller.wait_for_sandboxes({'user1': 'id1'}))
+
+        # assert
+        self.sandbox.logger.debug.assert_has_calls([
+            call("user1's sandbox id1 status is Started and Setup"),
+            call("Waiting for 1 out of 1 trainee sandboxes to be ready")])
+
+    @patch("cloudshell.orch.training.services.sandbox_readiness.monotonic")
+    @patch("cloudshell.orch.training.services.sandbox_readiness.sleep")
+    def test_pending_sandboxes_time_out_after_deadline(self, sleep_patch, monotonic_patch):
+        # arrange
+        self.polling_policy.deadline = 60
+        monotonic_patch.side_effect = [0, 30, 61]
+        self._set_statuses({
+            'id1': [('Started', 'Setup'), ('Started', 'Ready')],
+            'id2': [('Started', 'Setup'), ('Started', 'Setup')]})
+
+        # act
+        results = list(self.poller.wait_for_sandboxes({'user1': 'id1', 'user2': 'id2'}))
+
+        # assert
+        self.assertEqual([result.user for result in results], ['user1', 'user2'])
+        self.assertTrue(results[0].is_ready)
+        self.assertTrue(results[1].timed_out)
+        self.assertTrue(results[1].is_failed)
+        self.assertEqual(sleep_patch.call_count, 1)
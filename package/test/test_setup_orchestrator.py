@@ -42,20 +42,71 @@ class TestTrainingSetupWorkflow(unittest.TestCase):
         self.sandbox.workflow.add_to_configuration.assert_not_called()
         self.sandbox.workflow.on_configuration_ended.assert_not_called()
 
+    def test_register_student_skips_default_stages_of_emptied_sandbox(self):
+        # arrange
+        self.setup.env_data.instructor_mode = False
+        self.setup.default_setup_workflow = Mock()
+        self.setup.init_logic.is_student_sandbox_emptied = Mock(return_value=True)
+        self.setup.register()
+        stages = [self.sandbox.workflow.add_to_provisioning.call_args[0][0],
+                  self.sandbox.workflow.add_to_connectivity.call_args[0][0],
+                  self.sandbox.workflow.add_to_configuration.call_args[0][0]]
+
+        # act
+        for stage in stages:
+            stage(self.sandbox, None)
+
+        # assert
+        self.setup.default_setup_workflow.default_provisioning.assert_not_called()
+        self.setup.default_setup_workflow.default_connectivity.assert_not_called()
+        self.setup.default_setup_workflow.default_configuration.assert_not_called()
+
+    def test_register_student_runs_default_stages_of_not_emptied_sandbox(self):
+        # arrange
+        self.setup.env_data.instructor_mode = False
+        self.setup.default_setup_workflow = Mock()
+        self.setup.init_logic.is_student_sandbox_emptied = Mock(return_value=False)
+        self.setup.register()
+        stage = self.sandbox.workflow.add_to_provisioning.call_args[0][0]
+
+        # act
+        stage(self.sandbox, None)
+
+        # assert
+        self.setup.default_setup_workflow.default_provisioning.assert_called_once_with(self.sandbox, None)
+
     @patch('cloudshell.orch.training.setup_orchestrator.UsersDataManagerService')
     def test_initialize(self, users_data_manager_class):
         # arrange
         self.setup._users_data_manager.load = Mock()
         self.setup.init_logic.prepare_environment = Mock()
+        self.setup.env_data.instructor_mode = True
+        sandbox_data = Mock()
+        self.setup._reservation_snapshot.prefetch = Mock(return_value=[sandbox_data])
 
         # act
         self.setup.initialize()
 
         # assert
         self.setup.init_logic.prepare_environment.assert_called_once()
-        self.setup._users_data_manager.load.assert_called_once()
+        self.setup._reservation_snapshot.prefetch.assert_called_once()
+        self.setup._users_data_manager.load.assert_called_once_with(sandbox_data)
         self.setup.init_logic.prepare_environment.assert_called_once()
 
+    def test_initialize_student_does_not_prefetch(self):
+        # arrange
+        self.setup._users_data_manager.load = Mock()
+        self.setup.init_logic.prepare_environment = Mock()
+        self.setup.env_data.instructor_mode = False
+        self.setup._reservation_snapshot.prefetch = Mock()
+
+        # act
+        self.setup.initialize()
+
+        # assert
+        self.setup._reservation_snapshot.prefetch.assert_not_called()
+        self.setup._users_data_manager.load.assert_called_once_with(None)
+
     def test_do_on_configuration_ended(self):
         # arrange
         mock_sandbox: Sandbox = Mock()
@@ -70,6 +121,20 @@ class TestTrainingSetupWorkflow(unittest.TestCase):
         self.setup.user_sandbox_logic.create_user_sandboxes.assert_called_once_with(mock_sandbox,mock_components)
         self.setup._users_data_manager.save.assert_called_once()
 
+    def test_do_on_configuration_ended_saves_and_flushes_output_on_error(self):
+        # arrange
+        self.setup._sandbox_output = Mock()
+        self.setup._users_data_manager.save = Mock()
+        self.setup.user_sandbox_logic.create_user_sandboxes = Mock(side_effect=Exception())
+
+        # act
+        with self.assertRaises(Exception):
+            self.setup._do_on_configuration_ended(Mock(), Mock())
+
+        # assert
+        self.setup._sandbox_output.flush.assert_called_once()
+        self.setup._users_data_manager.save.assert_called_once()
+
     def test_initialize_and_register(self):
         # arrange
         self.setup.initialize = Mock()
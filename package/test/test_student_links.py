@@ -25,4 +25,5 @@ class TestStudentLinksProvider(unittest.TestCase):
         self.assertTrue(isinstance(result, StudentLinkModel))
         self.assertEqual(result.token, token)
         self.assertEqual(result.student_link, f"{training_portal_base_url}/{sandbox_id}?access={token}")
+        sandbox_api_service.login.assert_not_called()
 
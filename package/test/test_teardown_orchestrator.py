@@ -1,6 +1,7 @@
 import unittest
-from mock import Mock, MagicMock, patch, call
+from mock import Mock, MagicMock, patch, call, ANY
 
+from cloudshell.orch.training.models.config import TrainingWorkflowConfig
 from cloudshell.orch.training.teardown_orchestrator import TrainingTeardownWorkflow
 
 
@@ -31,4 +32,16 @@ class TestTrainingTeardownWorkflow(unittest.TestCase):
         teardown = TrainingTeardownWorkflow(self.sandbox)
 
         # assert
-        teardown._users_data_manager.load.assert_called()
\ No newline at end of file
+        teardown._users_data_manager.load.assert_called()
+
+    @patch('cloudshell.orch.training.teardown_orchestrator.UsersDataManagerService')
+    @patch('cloudshell.orch.training.teardown_orchestrator.SandboxLifecycleService')
+    def test_power_off_output_config(self, sandbox_lifecycle_service_mock, user_data_manager_service_mock):
+        # arrange
+        config = TrainingWorkflowConfig(max_concurrency=4, print_power_off_output=True)
+
+        # act
+        TrainingTeardownWorkflow(self.sandbox, config)
+
+        # assert
+        sandbox_lifecycle_service_mock.assert_called_once_with(self.sandbox, ANY, ANY, config.polling_policy, 4, True)
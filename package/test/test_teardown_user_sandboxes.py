@@ -1,8 +1,10 @@
 import unittest
 
-from mock import Mock, MagicMock, call
+from mock import Mock, MagicMock, call, ANY
 
 from cloudshell.orch.training.logic.teardown_user_sandboxes import SandboxTerminateLogic
+from cloudshell.orch.training.models.config import TrainingWorkflowConfig
+from cloudshell.orch.training.utils.parallel import ParallelTaskResult
 
 
 class TestTeardownUserSandboxes(unittest.TestCase):
@@ -12,14 +14,18 @@ class TestTeardownUserSandboxes(unittest.TestCase):
         self.users_data_manager = Mock()
         self.admin_login_token = Mock()
         self.sandbox_api.login = Mock(return_value=self.admin_login_token)
+        self.sandbox_api.delete_tokens = Mock(
+            side_effect=lambda user_tokens: [ParallelTaskResult(user, result=True) for user in user_tokens])
         self.sandbox_termination_service = Mock()
         self.sandbox_lifecycle_service = Mock()
         self.training_env = Mock()
         self.users_service = Mock()
+        self.users_service.deactivate_training_users = Mock(
+            side_effect=lambda sandbox_id, users: [ParallelTaskResult(user) for user in users])
 
         self.logic = SandboxTerminateLogic(self.sandbox_output_service, self.sandbox_api,
                                            self.sandbox_lifecycle_service, self.users_data_manager, self.training_env,
-                                           self.users_service)
+                                           self.users_service, TrainingWorkflowConfig(max_concurrency=4))
 
     def test_teardown_student_sandboxes(self):
         # arrange
@@ -27,7 +33,8 @@ class TestTeardownUserSandboxes(unittest.TestCase):
         self.training_env.users_list = ['user1', 'user2']
         user1_token = Mock()
         user2_token = Mock()
-        self.users_data_manager.get_key = Mock(side_effect=[user1_token, user2_token])
+        self.users_data_manager.get_key = Mock(side_effect=lambda user, key: {'user1': user1_token,
+                                                                              'user2': user2_token}[user])
         self.logic._delete_students_group = Mock()
         self.logic._sandbox_lifecycle_service = Mock()
 
@@ -35,10 +42,9 @@ class TestTeardownUserSandboxes(unittest.TestCase):
         self.logic.teardown_student_sandboxes(sandbox, None)
 
         # assert
-        self.logic._sandbox_lifecycle_service.end_student_reservation.assert_has_calls([call('user1',self.logic._training_env.instructor_mode), call('user2',self.logic._training_env.instructor_mode)])
-        self.logic._sandbox_api.delete_token.assert_has_calls(
-            [call(api_token=self.admin_login_token, user_token=user1_token),
-             call(api_token=self.admin_login_token, user_token=user2_token)])
+        self.logic._sandbox_lifecycle_service.end_student_reservation.assert_has_calls([call('user1',self.logic._training_env.instructor_mode), call('user2',self.logic._training_env.instructor_mode)], any_order=True)
+        self.logic._sandbox_api.delete_tokens.assert_called_once_with({'user1': user1_token, 'user2': user2_token})
+        self.logic._sandbox_api.login.assert_not_called()
         self.logic._delete_students_group.assert_called_once()
 
     def test_delete_students_group(self):
@@ -91,4 +97,141 @@ class TestTeardownUserSandboxes(unittest.TestCase):
         self.logic._teardown_student_sandboxes_inner(mock_sandbox)
 
         # assert
-        self.logic._delete_students_group.assert_not_called()
\ No newline at end of file
+        self.logic._delete_students_group.assert_not_called()
+
+    def test_teardown_student_sandboxes_inner_collects_failures(self):
+        # arrange
+        mock_sandbox = Mock()
+        self.logic._delete_students_group = Mock()
+        self.logic._training_env.instructor_mode = True
+        self.logic._training_env.users_list = ['user1', 'user2', 'user3']
+
+        def end_student_reservation(user, instructor_mode):
+            if user == 'user2':
+                raise Exception('end failed')
+        self.sandbox_lifecycle_service.end_student_reservation = Mock(side_effect=end_student_reservation)
+
+        # act
+        with self.assertRaisesRegex(Exception, '1 out of 3 users: user2'):
+            self.logic._teardown_student_sandboxes_inner(mock_sandbox)
+
+        # assert
+        self.assertEqual(self.sandbox_lifecycle_service.end_student_reservation.call_count, 3)
+        self.sandbox_api.delete_tokens.assert_called_once_with({'user1': ANY, 'user2': ANY, 'user3': ANY})
+        self.logic._delete_students_group.assert_called_once()
+        self.sandbox_output_service.notify.assert_called_once()
+
+    def test_teardown_student_sandboxes_inner_instructor_skips_users_without_sandbox(self):
+        # arrange
+        mock_sandbox = Mock()
+        self.logic._delete_students_group = Mock()
+        self.logic._training_env.instructor_mode = True
+        self.logic._training_env.users_list = ['user1', 'user2']
+        # the sandbox creation of user2 failed during setup
+        self.users_data_manager.get_key = Mock(
+            side_effect=lambda user, key: None if user == 'user2' else f'{user}_{key}')
+
+        # act
+        self.logic._teardown_student_sandboxes_inner(mock_sandbox)
+
+        # assert
+        self.sandbox_lifecycle_service.end_student_reservation.assert_called_once_with('user1', True)
+        self.sandbox_api.delete_tokens.assert_called_once_with({'user1': 'user1_token'})
+        self.sandbox_output_service.notify.assert_not_called()
+
+    def test_teardown_student_sandboxes_inner_student_without_users_data(self):
+        # arrange
+        mock_sandbox = Mock()
+        self.logic._training_env.instructor_mode = False
+        self.logic._training_env.users_list = ['student1']
+        self.users_data_manager.get_key = Mock(return_value=None)
+
+        # act
+        self.logic._teardown_student_sandboxes_inner(mock_sandbox)
+
+        # assert
+        self.sandbox_lifecycle_service.end_student_reservation.assert_called_once_with('student1', False)
+        self.sandbox_api.delete_tokens.assert_called_once_with({})
+        self.sandbox_output_service.notify.assert_not_called()
+
+    def test_teardown_student_sandboxes_inner_reports_token_failures(self):
+        # arrange
+        mock_sandbox = Mock()
+        self.logic._training_env.instructor_mode = False
+        self.logic._training_env.users_list = ['user1', 'user2', 'user3']
+        self.sandbox_api.delete_tokens = Mock(return_value=[ParallelTaskResult('user1', result=True),
+                                                            ParallelTaskResult('user2', result=False),
+                                                            ParallelTaskResult('user3', error=Exception('timeout'))])
+
+        # act
+        with self.assertRaisesRegex(Exception, 'Revoking REST API token failed for 2 out of 3 users: user2, user3'):
+            self.logic._teardown_student_sandboxes_inner(mock_sandbox)
+
+        # assert
+        self.assertEqual(self.sandbox_lifecycle_service.end_student_reservation.call_count, 3)
+        self.sandbox_output_service.debug_print.assert_any_call('Revoked REST API tokens of 1 out of 3 users')
+
+    def test_teardown_student_sandboxes_inner_instructor_deactivates_users(self):
+        # arrange
+        mock_sandbox = Mock()
+        self.logic._training_env.instructor_mode = True
+        self.logic._training_env.users_list = ['user1', 'user2', 'user3']
+        self.users_service.deactivate_training_users = Mock(return_value=[
+            ParallelTaskResult('user1'), ParallelTaskResult('user3', error=Exception('update failed'))])
+
+        # act
+        with self.assertRaisesRegex(Exception, 'Deactivating user failed for 1 out of 2 users: user3'):
+            self.logic._teardown_student_sandboxes_inner(mock_sandbox)
+
+        # assert
+        self.users_service.deactivate_training_users.assert_called_once_with(mock_sandbox.id,
+                                                                             ['user1', 'user2', 'user3'])
+        self.users_service.delete_training_users_group.assert_called_once_with(mock_sandbox.id)
+        self.sandbox_output_service.debug_print.assert_any_call('Deactivated 1 out of 3 users')
+
+    def test_teardown_student_sandboxes_inner_student_does_not_deactivate_users(self):
+        # arrange
+        self.logic._training_env.instructor_mode = False
+        self.logic._training_env.users_list = ['user1']
+
+        # act
+        self.logic._teardown_student_sandboxes_inner(Mock())
+
+        # assert
+        self.users_service.deactivate_training_users.assert_not_called()
+
+    def test_teardown_student_sandboxes_inner_group_deletion_failure_is_reported(self):
+        # arrange
+        mock_sandbox = Mock()
+        self.logic._training_env.instructor_mode = True
+        self.logic._training_env.users_list = ['user1', 'user2']
+        self.users_service.delete_training_users_group = Mock(side_effect=Exception('group in use'))
+        self.sandbox_lifecycle_service.end_student_reservation = Mock(
+            side_effect=lambda user, instructor_mode: self._raise_for_user(user, 'user2'))
+
+        # act
+        with self.assertRaises(Exception) as context:
+            self.logic._teardown_student_sandboxes_inner(mock_sandbox)
+
+        # assert
+        self.assertIn('Teardown of student sandbox failed for 1 out of 2 users: user2', str(context.exception))
+        self.assertIn('Deleting training users group failed: group in use', str(context.exception))
+        self.users_service.deactivate_training_users.assert_called_once_with(mock_sandbox.id, ['user1', 'user2'])
+
+    def _raise_for_user(self, user: str, failing_user: str):
+        if user == failing_user:
+            raise Exception('end failed')
+
+    def test_teardown_student_sandboxes_inner_deletes_group_when_deactivation_fails(self):
+        # arrange
+        mock_sandbox = Mock()
+        self.logic._training_env.instructor_mode = True
+        self.logic._training_env.users_list = ['user1', 'user2']
+        self.users_service.deactivate_training_users = Mock(side_effect=Exception('groups not available'))
+
+        # act
+        with self.assertRaisesRegex(Exception, 'Deactivating user failed for 2 out of 2 users'):
+            self.logic._teardown_student_sandboxes_inner(mock_sandbox)
+
+        # assert
+        self.users_service.delete_training_users_group.assert_called_once_with(mock_sandbox.id)
@@ -89,6 +89,19 @@ class TestUsersDataManagerService(unittest.TestCase):
         # assert
         self.assertTrue(users_data_manager._data == {'user': {'key1': 'value1'}})
 
+    def test_load_prefetched_sandbox_data(self):
+        # arrange
+        sandbox = Mock()
+        sandbox_data = Mock(SandboxDataKeyValues=[Mock(Key=USERS_DICT_KEY, Value='{"user": {"key1": "value1"}}')])
+        users_data_manager = UsersDataManagerService(sandbox)
+
+        # act
+        users_data_manager.load(sandbox_data)
+
+        # assert
+        self.assertEqual(users_data_manager._data, {'user': {'key1': 'value1'}})
+        sandbox.automation_api.GetSandboxData.assert_not_called()
+
     def test_load_no_sandboxdata_from_server(self):
         # arrange
         sandbox = Mock()
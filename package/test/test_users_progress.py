@@ -0,0 +1,58 @@
+import unittest
+
+from mock import Mock, patch
+
+from cloudshell.orch.training.services.users_progress import UsersProgressReporter, UserProgressStates
+
+
+class TestUsersProgressReporter(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.sandbox_output = Mock()
+        self.reporter = UsersProgressReporter(self.sandbox_output, interval=30)
+
+    def test_get_summary(self):
+        # arrange
+        self.reporter.track(['user1', 'user2', 'user3', 'user4', 'user5'])
+        self.reporter._states['user1'] = UserProgressStates.READY
+        self.reporter._states['user2'] = UserProgressStates.PROVISIONING
+        self.reporter._states['user3'] = UserProgressStates.PROVISIONING
+        self.reporter._states['user4'] = UserProgressStates.FAILED
+
+        # act
+        summary = self.reporter.get_summary()
+
+        # assert
+        self.assertEqual(summary, "Trainee sandboxes: 1/5 ready, 2 provisioning, 1 queued, 1 failed")
+
+    @patch("cloudshell.orch.training.services.users_progress.monotonic")
+    def test_report_is_throttled(self, monotonic_patch):
+        # arrange
+        self.reporter.track(['user1', 'user2'])
+        monotonic_patch.return_value = 100
+
+        # act
+        self.reporter.set_state('user1', UserProgressStates.CREATING)
+        monotonic_patch.return_value = 110
+        self.reporter.set_state('user2', UserProgressStates.CREATING)
+        monotonic_patch.return_value = 131
+        self.reporter.set_state('user1', UserProgressStates.PROVISIONING)
+
+        # assert
+        self.assertEqual(self.sandbox_output.notify.call_count, 2)
+        self.sandbox_output.notify.assert_called_with(
+            "Trainee sandboxes: 0/2 ready, 1 creating, 1 provisioning")
+
+    @patch("cloudshell.orch.training.services.users_progress.monotonic")
+    def test_forced_report_ignores_interval(self, monotonic_patch):
+        # arrange
+        monotonic_patch.return_value = 100
+        self.reporter.track(['user1'])
+        self.reporter.set_state('user1', UserProgressStates.READY)
+
+        # act
+        self.reporter.report(force=True)
+
+        # assert
+        self.assertEqual(self.sandbox_output.notify.call_count, 2)
+        self.sandbox_output.notify.assert_called_with("Trainee sandboxes: 1/1 ready")
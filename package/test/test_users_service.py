@@ -1,7 +1,7 @@
 import unittest
 
 from cloudshell.api.common_cloudshell_api import CloudShellAPIError
-from mock import Mock, ANY, MagicMock
+from mock import Mock, ANY, MagicMock, call
 
 from cloudshell.orch.training.services.users import UsersService
 
@@ -156,4 +156,80 @@ class TestUsersService(unittest.TestCase):
             self.users_service.create_or_activate_training_user(user)
 
         self.api.AddNewUser.assert_not_called()
-        self.api.UpdateUser.assert_not_called()
\ No newline at end of file
+        self.api.UpdateUser.assert_not_called()
+
+    def test_create_or_activate_training_users(self):
+        # arrange
+        self.users_service = UsersService(self.api, Mock(), max_concurrency=4)
+        self.api.GetAllUsersDetails.return_value = Mock(Users=[Mock(Name='Active', IsActive=True),
+                                                               Mock(Name='inactive', IsActive=False),
+                                                               Mock(Name='other', IsActive=False)])
+
+        # act
+        results = self.users_service.create_or_activate_training_users(['active', 'inactive', 'new1', 'new2'])
+
+        # assert
+        self.assertTrue(all(result.succeeded for result in results))
+        self.api.GetAllUsersDetails.assert_called_once()
+        self.api.GetUserDetails.assert_not_called()
+        self.api.UpdateUser.assert_called_once_with('inactive', 'inactive', isActive=True)
+        self.api.AddNewUser.assert_has_calls([call('new1', ANY, 'new1', isActive=True),
+                                              call('new2', ANY, 'new2', isActive=True)], any_order=True)
+        self.assertEqual(self.api.AddNewUser.call_count, 2)
+
+    def test_create_or_activate_training_users_failure_does_not_stop_others(self):
+        # arrange
+        self.api.GetAllUsersDetails.return_value = Mock(Users=[])
+        self.api.AddNewUser.side_effect = [CloudShellAPIError('100', 'error', ''), None]
+
+        # act
+        results = self.users_service.create_or_activate_training_users(['new1', 'new2'])
+
+        # assert
+        self.assertEqual([result.succeeded for result in results], [False, True])
+        self.assertEqual(self.api.AddNewUser.call_count, 2)
+
+    def _user_info(self, name: str, is_admin: bool = False, is_domain_admin: bool = False) -> Mock:
+        user_info = Mock(IsAdmin=is_admin, IsDomainAdmin=is_domain_admin)
+        user_info.Name = name
+        return user_info
+
+    def _group_info(self, name: str, users: list) -> Mock:
+        group_info = Mock(Users=users)
+        group_info.Name = name
+        return group_info
+
+    def test_deactivate_training_users_skips_users_of_other_groups(self):
+        # arrange
+        self.users_service = UsersService(self.api, Mock(), max_concurrency=4)
+        self.api.GetGroupsDetails.return_value = Mock(Groups=[
+            self._group_info('training-sandbox_id', [self._user_info('user1'), self._user_info('user2'),
+                                                     self._user_info('employee')]),
+            self._group_info('training-other_sandbox_id', [self._user_info('User3')]),
+            self._group_info('Engineering', [self._user_info('employee')])])
+
+        # act
+        results = self.users_service.deactivate_training_users('sandbox_id',
+                                                               ['user1', 'user2', 'user3', 'employee', 'user4'])
+
+        # assert
+        self.assertEqual([result.item for result in results], ['user1', 'user2', 'user4'])
+        self.api.GetGroupsDetails.assert_called_once()
+        self.api.UpdateUser.assert_has_calls([call('user1', 'user1', isActive=False),
+                                              call('user2', 'user2', isActive=False),
+                                              call('user4', 'user4', isActive=False)], any_order=True)
+        self.assertEqual(self.api.UpdateUser.call_count, 3)
+
+    def test_deactivate_training_users_skips_admins(self):
+        # arrange
+        self.api.GetGroupsDetails.return_value = Mock(Groups=[
+            self._group_info('training-sandbox_id', [self._user_info('user1'),
+                                                     self._user_info('admin', is_admin=True),
+                                                     self._user_info('domain_admin', is_domain_admin=True)])])
+
+        # act
+        results = self.users_service.deactivate_training_users('sandbox_id', ['user1', 'admin', 'domain_admin'])
+
+        # assert
+        self.assertEqual([result.item for result in results], ['user1'])
+        self.api.UpdateUser.assert_called_once_with('user1', 'user1', isActive=False)